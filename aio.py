@@ -0,0 +1,222 @@
+"""asyncio API over the handlers.
+
+    import asyncio, aio
+
+    async def main():
+        async for inst in aio.iter_instances(region="eu-west-1"):
+            print(inst)
+        results = await aio.start_instances(["i-0abc", "i-0def"], timeout=30)
+        await aio.shutdown()
+
+Each function wraps the MaromClient method of the same name. Blocking boto3
+calls run on one bounded thread pool per event loop, so thousands of
+concurrent coroutines queue for a few dozen threads instead of each taking
+one. One MaromClient per (profile, region, owner) stays warm for the life of
+the loop. Cancelling a call or hitting its `timeout` drops it if it has not
+started; a call already on a thread finishes there and its result is discarded.
+"""
+from __future__ import annotations
+import asyncio
+import itertools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from client import MaromClient
+
+DEFAULT_WORKERS = 32
+STREAM_CHUNK = 100  # items fetched per executor hop while streaming a listing
+
+_runtimes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Runtime]" = weakref.WeakKeyDictionary()
+_workers = DEFAULT_WORKERS
+
+
+class Runtime:
+    """Executor and warm MaromClients for one event loop."""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="maromtool-aio")
+        self._clients: dict[tuple, MaromClient] = {}
+        self._lock = threading.Lock()
+
+    def client(self, profile: str | None = None, region: str | None = None, owner: str | None = None) -> MaromClient:
+        # Called on executor threads: building a session can read config files.
+        key = (profile, region, owner)
+        with self._lock:
+            c = self._clients.get(key)
+            if c is None:
+                c = self._clients[key] = MaromClient(profile, region, owner, self.max_workers)
+        return c
+
+    async def call(self, fn, *args, timeout: float | None = None):
+        fut = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        return await asyncio.wait_for(fut, timeout) if timeout is not None else await fut
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for c in clients:
+            c.close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def configure(max_workers: int = DEFAULT_WORKERS):
+    """Set the thread count for runtimes created from now on (one per event loop)."""
+    global _workers
+    if max_workers < 1:
+        raise ValueError("max_workers must be >= 1")
+    _workers = max_workers
+
+
+def runtime() -> Runtime:
+    """The running loop's Runtime, created on first use."""
+    loop = asyncio.get_running_loop()
+    rt = _runtimes.get(loop)
+    if rt is None:
+        rt = _runtimes[loop] = Runtime(_workers)
+    return rt
+
+
+async def shutdown():
+    """Flush pending record changes and stop the running loop's threads."""
+    rt = _runtimes.pop(asyncio.get_running_loop(), None)
+    if rt is not None:
+        await asyncio.get_running_loop().run_in_executor(None, rt.close)
+
+
+async def _run(method: str, *args, profile: str | None = None, region: str | None = None,
+               owner: str | None = None, timeout: float | None = None, **kwargs):
+    """MaromClient.<method>(*args, **kwargs) on the executor; profile, region and
+    owner pick the client and timeout bounds the wait, the rest pass through."""
+    rt = runtime()
+    return await rt.call(lambda: getattr(rt.client(profile, region, owner), method)(*args, **kwargs), timeout=timeout)
+
+
+async def _stream(make_iter, profile: str | None, region: str | None, timeout: float | None):
+    """Async-iterate a blocking iterator, STREAM_CHUNK items per executor hop;
+    `timeout` bounds each hop."""
+    rt = runtime()
+    it = await rt.call(lambda: iter(make_iter(rt.client(profile, region))), timeout=timeout)
+    try:
+        while True:
+            chunk = await rt.call(lambda: list(itertools.islice(it, STREAM_CHUNK)), timeout=timeout)
+            if not chunk:
+                return
+            for item in chunk:
+                yield item
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:  # still running on a worker after a cancel; it ends there
+                pass
+
+
+async def _gather(coros):
+    # One failure must not cancel its siblings: bulk helpers return each
+    # operation's result or exception in input order.
+    return await asyncio.gather(*coros, return_exceptions=True)
+
+
+# EC2
+
+async def create_instance(instance_type: str, os_choice: str = "ubuntu", client_token: str | None = None,
+                          lock: str | None = None, **kw):
+    return await _run("create_instance", instance_type, os_choice, client_token=client_token, lock=lock, **kw)
+
+
+async def start_instance(instance_id: str, **kw):
+    return await _run("start_instance", instance_id, **kw)
+
+
+async def stop_instance(instance_id: str, **kw):
+    return await _run("stop_instance", instance_id, **kw)
+
+
+async def iter_instances(profile: str | None = None, region: str | None = None, with_tags: bool = False,
+                         timeout: float | None = None):
+    async for item in _stream(lambda c: c.iter_instances(region, with_tags), profile, region, timeout):
+        yield item
+
+
+async def start_instances(instance_ids: list[str], **kw) -> list:
+    return await _gather(start_instance(i, **kw) for i in instance_ids)
+
+
+async def stop_instances(instance_ids: list[str], **kw) -> list:
+    return await _gather(stop_instance(i, **kw) for i in instance_ids)
+
+
+# S3
+
+async def create_bucket(bucket_name: str, public: bool = False, confirm: str | None = None, **kw):
+    return await _run("create_bucket", bucket_name, public, confirm, **kw)
+
+
+async def upload_file(bucket_name: str, key: str, file_path: str, **kw):
+    return await _run("upload_file", bucket_name, key, file_path, **kw)
+
+
+async def upload_files(uploads: list[tuple[str, str, str]], **kw) -> list:
+    """Upload (bucket, key, file_path) triples concurrently."""
+    return await _gather(upload_file(b, k, f, **kw) for b, k, f in uploads)
+
+
+async def list_buckets(profile: str | None = None, region: str | None = None, timeout: float | None = None):
+    async for item in _stream(lambda c: c.list_buckets(), profile, region, timeout):
+        yield item
+
+
+# Route53
+
+async def create_zone(name: str, **kw):
+    return await _run("create_zone", name, **kw)
+
+
+async def list_zones(profile: str | None = None, region: str | None = None, timeout: float | None = None):
+    async for item in _stream(lambda c: c.list_zones(), profile, region, timeout):
+        yield item
+
+
+async def list_records(hosted_zone_id: str, name: str | None = None, rtype: str | None = None, prefix: bool = False,
+                       profile: str | None = None, region: str | None = None, timeout: float | None = None):
+    async for item in _stream(lambda c: c.list_records(hosted_zone_id, name, rtype, prefix), profile, region, timeout):
+        yield item
+
+
+async def get_nameservers(hosted_zone_id: str, **kw) -> list[str]:
+    return await _run("get_nameservers", hosted_zone_id, **kw)
+
+
+async def upsert_record(hosted_zone_id: str, name: str, rtype: str, ttl: int, values: list[str], **kw):
+    return await _run("upsert_record", hosted_zone_id, name, rtype, ttl, values, **kw)
+
+
+async def delete_record(hosted_zone_id: str, name: str, rtype: str, values: list[str], **kw):
+    return await _run("delete_record", hosted_zone_id, name, rtype, values, **kw)
+
+
+async def export_zone(hosted_zone_id: str, out, **kw):
+    return await _run("export_zone", hosted_zone_id, out, **kw)
+
+
+async def import_zone(hosted_zone_id: str, lines, origin: str | None = None, **kw):
+    return await _run("import_zone", hosted_zone_id, lines, origin, **kw)
+
+
+async def change_record(hosted_zone_id: str, action: str, rrset: dict, profile: str | None = None,
+                        region: str | None = None, timeout: float | None = None):
+    """Queue one change on the client's per-zone coalescer; changes made close
+    together share one ChangeBatch. Waiting for the batch holds no thread."""
+    rt = runtime()
+    fut = await rt.call(lambda: rt.client(profile, region).changes().submit(hosted_zone_id, action, rrset),
+                        timeout=timeout)
+    wrapped = asyncio.wrap_future(fut)
+    return await asyncio.wait_for(wrapped, timeout) if timeout is not None else await wrapped
+
+
+async def change_records(hosted_zone_id: str, changes: list[tuple[str, dict]], **kw) -> list:
+    """Apply (action, rrset) changes concurrently, coalesced into as few batches as possible."""
+    return await _gather(change_record(hosted_zone_id, a, rr, **kw) for a, rr in changes)
@@ -0,0 +1,273 @@
+"""Benchmarks for maromtool against the in-process fake AWS backend.
+
+    python -m benchmarks.run [--scale small|full] [--only ec2_list,s3_list] [--update-baselines]
+
+Every case runs against a fresh boto3 session (like one CLI invocation) with
+`--latency` seconds injected per API call. Wall time is the best of `--repeat`
+runs; API calls come from the first run and peak memory from an extra run
+under tracemalloc (for cold_start: the child's max RSS). Results are compared
+with benchmarks/baselines.json: any extra API call is a regression, wall time
+and memory may exceed the baseline by --wall-tolerance (plus --wall-slack
+seconds) / --mem-tolerance.
+Wall-time baselines are machine dependent; refresh them with --update-baselines
+on the machine that runs the comparison.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import change_queue  # noqa: E402
+import ec2_handler as ec2h  # noqa: E402
+import fanout  # noqa: E402
+import route53_handler as r53h  # noqa: E402
+import s3_handler as s3h  # noqa: E402
+from benchmarks.fake_aws import FakeAWS, REGIONS  # noqa: E402
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+SCALES = {
+    "small": {"instances": 1000, "buckets": 200, "objects": 10_000, "zones": 100, "records": 10_000,
+              "bulk": 50, "uploads": 50, "changes": 500},
+    "full": {"instances": 10_000, "buckets": 1000, "objects": 1_000_000, "zones": 500, "records": 100_000,
+             "bulk": 200, "uploads": 200, "changes": 5000},
+}
+WORKERS = 16
+
+CASES = {}
+
+
+def case(fn):
+    """Register fn(fake, n) -> thunk; fn seeds the fake, the thunk is what gets measured."""
+    CASES[fn.__name__] = fn
+    return fn
+
+
+@case
+def ec2_list(fake, n):
+    fake.seed_instances(n["instances"])
+    fake.seed_instances(n["instances"] // 10, cli=False)
+    return lambda: ec2h.list_instances(fake.session())
+
+
+@case
+def ec2_list_regions(fake, n):
+    for r in REGIONS:
+        fake.seed_instances(n["instances"] // len(REGIONS), region=r)
+
+    def run():
+        session = fake.session()
+        return list(fanout.iter_fanout([({"Region": r}, r) for r in REGIONS],
+                                       lambda r: ec2h.iter_instances(session, r), WORKERS))
+    return run
+
+
+@case
+def s3_list(fake, n):
+    fake.seed_buckets(n["buckets"] // 2)
+    fake.seed_buckets(n["buckets"] - n["buckets"] // 2, cli=False, prefix="other")
+    return lambda: s3h.list_buckets(fake.session())
+
+
+@case
+def route53_list_zones(fake, n):
+    fake.seed_zones(n["zones"])
+    fake.seed_zones(n["zones"] // 5, cli=False, prefix="other")
+    return lambda: r53h.list_zones(fake.session())
+
+
+@case
+def route53_list_records(fake, n):
+    zid = fake.seed_zones(1)[0]
+    fake.seed_records(zid, n["records"])
+    return lambda: r53h.list_records(fake.session(), zid)
+
+
+@case
+def route53_seek_record(fake, n):
+    zid = fake.seed_zones(1)[0]
+    fake.seed_records(zid, n["records"])
+    name = f"host{n['records'] // 2:07d}.{fake.zones[zid]['name']}"
+    return lambda: r53h.list_records(fake.session(), zid, name=name, rtype="A")
+
+
+@case
+def route53_export(fake, n):
+    zid = fake.seed_zones(1)[0]
+    fake.seed_records(zid, n["records"])
+
+    def run():
+        with open(os.devnull, "w", encoding="utf-8") as out:
+            return r53h.export_zone(fake.session(), zid, out)
+    return run
+
+
+@case
+def route53_import(fake, n):
+    zid = fake.seed_zones(1)[0]
+    lines = [f"host{i:07d} 300 IN A 10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}\n" for i in range(n["records"])]
+    return lambda: r53h.import_zone(fake.session(), zid, lines)
+
+
+@case
+def ec2_bulk_start_stop(fake, n):
+    ids = fake.seed_instances(n["bulk"], state="stopped")
+
+    def run():
+        session = fake.session()
+        with ThreadPoolExecutor(WORKERS) as pool:
+            list(pool.map(lambda i: ec2h.start_instance(session, i), ids))
+            list(pool.map(lambda i: ec2h.stop_instance(session, i), ids))
+    return run
+
+
+@case
+def s3_uploads(fake, n):
+    bucket = fake.seed_buckets(1)[0]
+    fake.seed_objects(bucket, n["objects"])
+    tmp = tempfile.mkdtemp(prefix="maromtool-bench-")
+    paths = []
+    for i in range(n["uploads"]):
+        paths.append(os.path.join(tmp, f"f{i}.bin"))
+        with open(paths[-1], "wb") as fh:
+            fh.write(os.urandom(64 * 1024))
+
+    def run():
+        session = fake.session()
+        with ThreadPoolExecutor(WORKERS) as pool:
+            list(pool.map(lambda p: s3h.upload_file(session, fake.buckets[bucket]["region"], bucket,
+                                                    os.path.basename(p), p), paths))
+    return run
+
+
+@case
+def route53_record_batches(fake, n):
+    zid = fake.seed_zones(1)[0]
+    apex = fake.zones[zid]["name"]
+
+    def run():
+        # A window longer than the run keeps the batch count deterministic:
+        # batches go out when full and on the explicit flush.
+        with change_queue.ChangeCoalescer(fake.session(), window=60) as q, ThreadPoolExecutor(WORKERS) as pool:
+            futures = list(pool.map(lambda i: q.upsert(zid, f"rec{i}.{apex}", "A", 60, [f"10.0.{i >> 8 & 255}.{i & 255}"]),
+                                    range(n["changes"])))
+            q.flush()
+            return [f.result() for f in futures]
+    return run
+
+
+def cold_start(repeat: int) -> dict:
+    """`maromtool.py --help` in a fresh interpreter: imports plus parser construction."""
+    walls, peak = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "maromtool.py"), "--help"],
+                                stdout=subprocess.DEVNULL, cwd=ROOT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        walls.append(time.perf_counter() - started)
+        peak = max(peak, usage.ru_maxrss * 1024)
+        if proc.returncode:
+            raise RuntimeError(f"cold start exited with {proc.returncode}")
+    return {"wall_s": round(min(walls), 4), "api_calls": 0, "peak_mib": round(peak / 1048576, 2)}
+
+
+def measure(name: str, scale: dict, repeat: int, latency: float, throttle_rate: float) -> dict:
+    fake = FakeAWS(latency=latency, throttle_rate=throttle_rate, retry_delay=latency)
+    thunk = CASES[name](fake, scale)
+    walls, calls = [], None
+    with fake.installed():
+        for _ in range(repeat):
+            fake.calls.clear()
+            started = time.perf_counter()
+            thunk()
+            walls.append(time.perf_counter() - started)
+            if calls is None:
+                calls = fake.total_calls()
+                ops = dict(sorted(fake.calls.items()))
+        tracemalloc.start()
+        try:
+            thunk()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"wall_s": round(min(walls), 4), "api_calls": calls, "peak_mib": round(peak / 1048576, 2), "operations": ops}
+
+
+def compare(results: dict, baselines: dict, wall_tol: float, wall_slack: float, mem_tol: float) -> list[str]:
+    problems = []
+    for name, r in results.items():
+        b = baselines.get(name)
+        if b is None:
+            continue
+        if r["api_calls"] > b["api_calls"]:
+            problems.append(f"{name}: {r['api_calls']} API calls, baseline {b['api_calls']}")
+        if r["wall_s"] > b["wall_s"] * wall_tol + wall_slack:
+            problems.append(f"{name}: {r['wall_s']:.3f}s wall, baseline {b['wall_s']:.3f}s (x{wall_tol})")
+        if r["peak_mib"] > b["peak_mib"] * mem_tol:
+            problems.append(f"{name}: {r['peak_mib']:.1f} MiB peak, baseline {b['peak_mib']:.1f} MiB (x{mem_tol})")
+    return problems
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="benchmarks.run", description="maromtool benchmarks against a fake AWS backend")
+    p.add_argument("--scale", choices=sorted(SCALES), default="small")
+    p.add_argument("--only", help="comma-separated case names (default: all)")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--latency", type=float, default=0.002, help="seconds injected per API call")
+    p.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of calls throttled (and retried)")
+    p.add_argument("--wall-tolerance", type=float, default=1.5)
+    p.add_argument("--wall-slack", type=float, default=0.1, help="seconds allowed on top of --wall-tolerance")
+    p.add_argument("--mem-tolerance", type=float, default=1.25)
+    p.add_argument("--update-baselines", action="store_true")
+    p.add_argument("--json", help="also write the results to this file")
+    args = p.parse_args(argv)
+
+    names = ["cold_start", *CASES]
+    if args.only:
+        names = [n.strip() for n in args.only.split(",") if n.strip()]
+        unknown = set(names) - {"cold_start", *CASES}
+        if unknown:
+            p.error(f"unknown cases: {sorted(unknown)}")
+    scale = SCALES[args.scale]
+    results = {}
+    for name in names:
+        if name == "cold_start":
+            results[name] = cold_start(args.repeat)
+        else:
+            results[name] = measure(name, scale, args.repeat, args.latency, args.throttle_rate)
+        r = results[name]
+        print(f"{name:<24} {r['wall_s']:>8.3f}s  {r['api_calls']:>6} calls  {r['peak_mib']:>8.2f} MiB", file=sys.stderr)
+
+    try:
+        with open(BASELINES, encoding="utf-8") as fh:
+            baselines = json.load(fh)
+    except FileNotFoundError:
+        baselines = {}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    if args.update_baselines:
+        current = baselines.setdefault(args.scale, {})
+        current.update({k: {m: v[m] for m in ("wall_s", "api_calls", "peak_mib")} for k, v in results.items()})
+        with open(BASELINES, "w", encoding="utf-8") as fh:
+            json.dump(baselines, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        return 0
+    problems = compare(results, baselines.get(args.scale, {}), args.wall_tolerance, args.wall_slack, args.mem_tolerance)
+    for line in problems:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
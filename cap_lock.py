@@ -0,0 +1,209 @@
+"""Cross-process lock around the EC2 cap check and launch.
+
+Counting instances and launching one must happen as a unit, or two concurrent
+`ec2 create` runs both see one instance and both launch. A lock backend has
+acquire(timeout) -> state, confirm() (raises RuntimeError if the lock was
+lost; called right before launching) and release(state); `state` is a small
+JSON dict persisted with the lock, used to remember recent launches that
+DescribeInstances may not list yet. Backends are picked with a spec string
+(`--lock` or $MAROMTOOL_CAP_LOCK):
+
+    file                 flock on a file in the cache dir (one host)
+    dynamodb:TABLE       lease item in a DynamoDB table keyed by LockName (S)
+
+More can be added to BACKENDS.
+"""
+from __future__ import annotations
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from botocore.exceptions import BotoCoreError
+from botocore.exceptions import ClientError
+
+from utils import cache_dir, client_for
+
+WAIT_TIMEOUT = 120.0
+LEASE_TTL = 60.0  # a DynamoDB lease left by a crashed process frees itself after this
+RENEW_EVERY = 1 / 3  # of the TTL: how often a held lease is extended
+_POLL = (0.05, 1.0)  # first and longest sleep between attempts
+log = logging.getLogger(__name__)
+
+
+def _waits(timeout: float):
+    """Sleep between attempts with backoff; stop yielding once `timeout` has passed."""
+    deadline = time.monotonic() + timeout
+    delay = _POLL[0]
+    while time.monotonic() < deadline:
+        yield
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, _POLL[1])
+
+
+class FileLock:
+    """Exclusive flock on <cache dir>/locks/<name>.lock; state in <name>.json.
+    The kernel drops the lock if the process dies."""
+
+    def __init__(self, name: str):
+        d = cache_dir("locks")
+        self.path = os.path.join(d, f"{name}.lock")
+        self.state_path = os.path.join(d, f"{name}.json")
+        self._fd = None
+
+    def acquire(self, timeout: float = WAIT_TIMEOUT) -> dict:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        for _ in _waits(timeout):
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                continue
+        else:
+            os.close(fd)
+            raise RuntimeError(f"Timed out waiting for lock {self.path}")
+        self._fd = fd
+        try:
+            with open(self.state_path, encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def confirm(self):
+        pass  # an flock lasts as long as the descriptor
+
+    def release(self, state: dict):
+        try:
+            tmp = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(state, fh)
+            os.replace(tmp, self.state_path)
+        finally:
+            fd, self._fd = self._fd, None
+            os.close(fd)  # closing the descriptor releases the flock
+
+
+class DynamoDBLease:
+    """Lease on item {LockName: name} of `table`, shared by every host using it.
+
+    Taking it is a conditional update that succeeds only when no one holds an
+    unexpired lease; while held, a background thread extends it every
+    ttl * RENEW_EVERY seconds, so slow calls under the lock cannot outlive it.
+    confirm() renews it once more and raises if it was lost anyway (the
+    process stalled past the TTL); releasing clears the owner and stores the
+    state, and raises if someone else took the lease in between. The table
+    needs only a string partition key named LockName.
+    """
+
+    def __init__(self, session, table: str, name: str, ttl: float = LEASE_TTL):
+        self.ddb = client_for(session, "dynamodb")
+        self.table = table
+        self.key = {"LockName": {"S": name}}
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lost = False
+        self._stop = None
+
+    def _describe(self) -> str:
+        return f"lease {self.key['LockName']['S']} in table {self.table}"
+
+    def acquire(self, timeout: float = WAIT_TIMEOUT) -> dict:
+        for _ in _waits(timeout):
+            now = time.time()
+            try:
+                resp = self.ddb.update_item(
+                    TableName=self.table, Key=self.key,
+                    UpdateExpression="SET LeaseOwner = :me, ExpiresAt = :exp",
+                    ConditionExpression="attribute_not_exists(LeaseOwner) OR ExpiresAt < :now",
+                    ExpressionAttributeValues={":me": {"S": self.owner}, ":exp": {"N": repr(now + self.ttl)},
+                                               ":now": {"N": repr(now)}},
+                    ReturnValues="ALL_NEW")
+            except ClientError as e:
+                if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                    continue
+                raise
+            self._lost = False
+            self._stop = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(self._stop,), name="maromtool-lease", daemon=True).start()
+            return json.loads(resp["Attributes"].get("LeaseState", {}).get("S", "{}"))
+        raise RuntimeError(f"Timed out waiting for {self._describe()}")
+
+    def _renew(self) -> bool:
+        """Extend our lease by the TTL; False if it is no longer ours."""
+        try:
+            self.ddb.update_item(
+                TableName=self.table, Key=self.key,
+                UpdateExpression="SET ExpiresAt = :exp",
+                ConditionExpression="LeaseOwner = :me",
+                ExpressionAttributeValues={":me": {"S": self.owner}, ":exp": {"N": repr(time.time() + self.ttl)}})
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+        return True
+
+    def _heartbeat(self, stop: threading.Event):
+        while not stop.wait(self.ttl * RENEW_EVERY):
+            try:
+                if not self._renew():
+                    self._lost = True
+                    return
+            except (BotoCoreError, ClientError):
+                pass  # retried next beat; confirm() checks before anything irreversible
+
+    def confirm(self):
+        if self._lost or not self._renew():
+            self._lost = True
+            raise RuntimeError(f"Lost the {self._describe()} (it expired and was taken); not launching")
+
+    def release(self, state: dict):
+        self._stop.set()
+        try:
+            self.ddb.update_item(
+                TableName=self.table, Key=self.key,
+                UpdateExpression="SET LeaseState = :s REMOVE LeaseOwner, ExpiresAt",
+                ConditionExpression="LeaseOwner = :me",
+                ExpressionAttributeValues={":s": {"S": json.dumps(state)}, ":me": {"S": self.owner}})
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            raise RuntimeError(f"Lost the {self._describe()} before releasing it; "
+                               f"its state was not saved: {json.dumps(state)}") from None
+
+
+BACKENDS = {
+    "file": lambda session, name, arg: FileLock(name),
+    "dynamodb": lambda session, name, arg: DynamoDBLease(session, arg, name),
+}
+
+
+def backend(spec: str | None, session, name: str):
+    """Lock `name` on the backend `spec` (default: $MAROMTOOL_CAP_LOCK, else 'file')."""
+    spec = spec or os.environ.get("MAROMTOOL_CAP_LOCK") or "file"
+    kind, _, arg = spec.partition(":")
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown lock backend {kind!r}; use one of {sorted(BACKENDS)}")
+    if kind == "dynamodb" and not arg:
+        raise ValueError("The dynamodb lock backend needs a table: dynamodb:TABLE")
+    return BACKENDS[kind](session, name, arg)
+
+
+@contextlib.contextmanager
+def held(lock, timeout: float = WAIT_TIMEOUT):
+    """Hold `lock` for the block; yields its state dict, saved on exit. If the
+    block raised, a failing release is logged so it does not replace that error."""
+    state = lock.acquire(timeout)
+    try:
+        yield state
+    except BaseException:
+        try:
+            lock.release(state)
+        except Exception as e:
+            log.warning("Releasing the cap lock failed: %s", e)
+        raise
+    lock.release(state)
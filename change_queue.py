@@ -0,0 +1,187 @@
+from __future__ import annotations
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import boto3
+from botocore.exceptions import ClientError
+import route53_handler as r53h
+
+DEFAULT_WINDOW = 0.05  # seconds a zone's first pending change waits for company
+
+
+class ChangeCoalescer:
+    """Per-zone write-coalescing queue for Route53 record changes.
+
+    Changes for a zone that arrive within `window` seconds of the first one are
+    merged into a single ChangeBatch (last write wins per name/type) and every
+    caller's future completes with the shared ChangeId. A zone is flushed early
+    once its batch reaches the Route53 limits of 1000 record elements or 32000
+    value characters (UPSERT counts twice against both). If Route53 rejects a
+    batch as invalid, it is split and resubmitted in halves, so only the
+    callers whose own change is bad get the error. A zone has at most one
+    batch in flight; batches sealed meanwhile queue behind it in order, so a
+    later write never overtakes an earlier one. `on_batch(zone_id)`, if
+    given, is called after every batch is submitted, successfully or not,
+    before its callers' futures complete.
+    """
+
+    def __init__(self, session: boto3.Session, window: float = DEFAULT_WINDOW, on_batch=None):
+        if window < 0:
+            raise ValueError("window must be >= 0")
+        self._r53 = r53h.r53_client(session)
+        self._window = window
+        self._on_batch = on_batch
+        self._lock = threading.Lock()
+        self._pending: dict[str, dict[tuple, tuple[str, dict, list[Future]]]] = {}
+        self._weights: dict[str, tuple[int, int]] = {}
+        self._timers: dict[str, threading.Timer] = {}
+        self._queued: dict[str, deque] = {}
+        self._inflight: set[str] = set()
+        self._idle = threading.Condition(self._lock)
+        self._verified: set[str] = set()
+        self._closed = False
+
+    @staticmethod
+    def _weight(action: str, rrset: dict) -> tuple[int, int]:
+        """(record elements, value characters) the change counts for in a batch."""
+        records = rrset.get("ResourceRecords", [])
+        factor = 2 if action == "UPSERT" else 1
+        return max(1, len(records)) * factor, sum(len(r["Value"]) for r in records) * factor
+
+    @staticmethod
+    def _too_big(records: int, chars: int) -> bool:
+        return records > r53h.BATCH_MAX_RECORDS or chars > r53h.BATCH_MAX_CHARS
+
+    def submit(self, hosted_zone_id: str, action: str, rrset: dict) -> Future:
+        if action not in ("CREATE", "UPSERT", "DELETE"):
+            raise ValueError(f"Unsupported action: {action}")
+        zid = r53h.strip_zone_id(hosted_zone_id)
+        key = (r53h.normalize_name(rrset["Name"]), rrset["Type"])
+        weight = self._weight(action, rrset)
+        if self._too_big(*weight):
+            raise ValueError(f"Change for {rrset['Name']} {rrset['Type']} exceeds the ChangeBatch limit")
+        fut: Future = Future()
+        drain = False
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ChangeCoalescer is closed")
+            zone = self._pending.setdefault(zid, {})
+            prev = zone.get(key)
+            old = self._weight(prev[0], prev[1]) if prev else (0, 0)
+            records, chars = self._weights.get(zid, (0, 0))
+            total = (records + weight[0] - old[0], chars + weight[1] - old[1])
+            if self._too_big(*total):
+                # Full: send what is pending and start a new batch with this change.
+                drain = self._seal(zid)
+                zone = self._pending.setdefault(zid, {})
+                prev, total = None, weight
+            futures = prev[2] if prev else []
+            futures.append(fut)
+            zone[key] = (action, rrset, futures)
+            self._weights[zid] = total
+            if zid not in self._timers:
+                timer = threading.Timer(self._window, self.flush, args=(zid,))
+                timer.daemon = True
+                self._timers[zid] = timer
+                timer.start()
+        if drain:
+            self._drain(zid)
+        return fut
+
+    def upsert(self, hosted_zone_id: str, name: str, rtype: str, ttl: int, values: list[str]) -> Future:
+        return self.submit(hosted_zone_id, "UPSERT", {
+            "Name": name, "Type": rtype, "TTL": ttl,
+            "ResourceRecords": [{"Value": v} for v in values]})
+
+    def delete(self, hosted_zone_id: str, name: str, rtype: str, values: list[str], ttl: int | None = None) -> Future:
+        rrset = {"Name": name, "Type": rtype, "ResourceRecords": [{"Value": v} for v in values]}
+        if ttl is not None:
+            rrset["TTL"] = ttl
+        return self.submit(hosted_zone_id, "DELETE", rrset)
+
+    def flush(self, hosted_zone_id: str | None = None):
+        """Submit pending changes now (all zones when no zone is given). A zone
+        with a batch in flight gets the new one queued behind it instead."""
+        with self._lock:
+            zids = [r53h.strip_zone_id(hosted_zone_id)] if hosted_zone_id else list(self._pending)
+            mine = [zid for zid in zids if self._seal(zid)]
+        for zid in mine:
+            self._drain(zid)
+
+    def _seal(self, zid: str) -> bool:
+        """Queue the zone's pending batch (lock held). True if the caller must
+        now _drain the zone, i.e. no other thread is submitting for it."""
+        timer = self._timers.pop(zid, None)
+        if timer:
+            timer.cancel()
+        changes = self._pending.pop(zid, None)
+        self._weights.pop(zid, None)
+        if changes:
+            self._queued.setdefault(zid, deque()).append(changes)
+        if not self._queued.get(zid) or zid in self._inflight:
+            return False
+        self._inflight.add(zid)
+        return True
+
+    def _drain(self, zid: str):
+        """Submit the zone's queued batches one at a time, oldest first."""
+        while True:
+            with self._lock:
+                queue = self._queued.get(zid)
+                if not queue:
+                    self._queued.pop(zid, None)
+                    self._inflight.discard(zid)
+                    self._idle.notify_all()
+                    return
+                changes = queue.popleft()
+            self._submit_batch(zid, changes)
+
+    def _submit_batch(self, zid: str, changes: dict):
+        futures = [f for _, _, fs in changes.values() for f in fs]
+        try:
+            if zid not in self._verified:
+                r53h.ensure_cli_zone(self._r53, zid)
+                self._verified.add(zid)
+            try:
+                res = self._r53.change_resource_record_sets(
+                    HostedZoneId=zid,
+                    ChangeBatch={"Changes": [{"Action": a, "ResourceRecordSet": rr} for a, rr, _ in changes.values()]},
+                )
+            finally:
+                if self._on_batch is not None:
+                    self._on_batch(zid)
+        except Exception as e:
+            if (len(changes) > 1 and isinstance(e, ClientError)
+                    and e.response["Error"]["Code"] == "InvalidChangeBatch"):
+                # Batches are atomic, so nothing was applied: retry in halves
+                # until the bad changes are alone.
+                items = list(changes.items())
+                half = len(items) // 2
+                self._submit_batch(zid, dict(items[:half]))
+                self._submit_batch(zid, dict(items[half:]))
+                return
+            for f in futures:
+                f.set_exception(e)
+            return
+        change_id = r53h.strip_zone_id(res["ChangeInfo"]["Id"])
+        for action, rr, fs in changes.values():
+            out = {"HostedZoneId": zid, "Action": action, "Name": rr["Name"], "Type": rr["Type"],
+                   "ChangeId": change_id, "Coalesced": len(futures)}
+            for f in fs:
+                f.set_result(out)
+
+    def close(self):
+        """Submit everything pending and wait until no batch is in flight."""
+        with self._lock:
+            self._closed = True
+        self.flush()
+        with self._lock:
+            while self._inflight:
+                self._idle.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,228 @@
+from __future__ import annotations
+import functools
+import threading
+
+import boto3
+import botocore.session
+import change_queue
+import credential_cache
+import dns_verify
+import ec2_handler as ec2h
+import fanout
+import inventory
+import model_cache
+import result_cache
+import route53_handler as r53h
+import s3_handler as s3h
+import tagging
+import zone_snapshot
+from utils import client_settings, configure_session, pool_size
+
+
+_sessions: dict | None = None
+_sessions_lock = threading.Lock()
+
+
+def keep_sessions():
+    """Reuse one session per (profile, region) from now on, so long-lived
+    processes (the daemon) keep credentials and warm clients across commands."""
+    global _sessions
+    _sessions = {}
+
+
+def cached_sessions() -> list:
+    with _sessions_lock:
+        return list((_sessions or {}).values())
+
+
+def make_session(profile: str | None, region: str | None):
+    if _sessions is not None:
+        with _sessions_lock:
+            s = _sessions.get((profile, region))
+            if s is None:
+                s = _sessions[(profile, region)] = _new_session(profile, region)
+            return s
+    return _new_session(profile, region)
+
+
+def _new_session(profile: str | None, region: str | None):
+    core = botocore.session.Session(profile=profile or None)
+    core.lazy_register_component("data_loader",
+                                 lambda: model_cache.create_loader(core.get_config_variable("data_path")))
+    credential_cache.install(core)
+    return boto3.Session(botocore_session=core, region_name=region)
+
+
+def _mutates(service: str):
+    """Invalidate `service`'s cached --max-age results in the client's scope after
+    the call, even a failed one: it may still have changed something."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def method(self, *args, **kwargs):
+            try:
+                return fn(self, *args, **kwargs)
+            finally:
+                result_cache.invalidate(self.scope, service)
+        return method
+    return wrap
+
+
+class MaromClient:
+    """Library entry point: one session (and its warm clients) for a profile/region.
+
+    Methods return plain dicts/lists, or iterators for listings that can be
+    streamed; errors surface as the handlers raise them (ClientError,
+    ValueError, PermissionError, RuntimeError). Safe to share between threads.
+    """
+
+    def __init__(self, profile: str | None = None, region: str | None = None, owner: str | None = None,
+                 max_workers: int = fanout.DEFAULT_WORKERS, session: boto3.Session | None = None):
+        self.profile = profile
+        self.owner = owner
+        self.max_workers = max_workers
+        self.session = session or make_session(profile, region)
+        self.region = region or self.session.region_name
+        self._regions: dict[str, list[str]] = {}
+        self._changes: change_queue.ChangeCoalescer | None = None
+        self._lock = threading.Lock()
+        if pool_size(max_workers) > client_settings(self.session)["max_pool_connections"]:
+            configure_session(self.session, max_pool_connections=pool_size(max_workers))
+
+    @property
+    def scope(self) -> str:
+        """Key for per-profile local state (snapshot, inventory)."""
+        return self.profile or "default"
+
+    def regions(self, spec: str = "all") -> list[str]:
+        """Expand 'all' or 'r1,r2'; resolved once per client."""
+        with self._lock:
+            if spec not in self._regions:
+                self._regions[spec] = fanout.resolve_regions(self.session, spec, self.profile)
+            return self._regions[spec]
+
+    # EC2
+
+    @_mutates("ec2")
+    def create_instance(self, instance_type: str, os_choice: str = "ubuntu", client_token: str | None = None,
+                        lock: str | None = None) -> dict:
+        return ec2h.create_instance(self.session, instance_type, os_choice, self.owner, client_token, lock)
+
+    @_mutates("ec2")
+    def start_instance(self, instance_id: str) -> dict:
+        return ec2h.start_instance(self.session, instance_id)
+
+    @_mutates("ec2")
+    def stop_instance(self, instance_id: str) -> dict:
+        return ec2h.stop_instance(self.session, instance_id)
+
+    def iter_instances(self, region: str | None = None, with_tags: bool = False):
+        return ec2h.iter_instances(self.session, region, with_tags)
+
+    def list_instances(self, region: str | None = None) -> list[dict]:
+        return ec2h.list_instances(self.session, region)
+
+    def iter_instances_in_regions(self, regions: str | list[str] = "all", limiter=None):
+        """Instances of several regions in parallel, each item tagged with its Region
+        (or a {"Region", "Error"} item for a failing region)."""
+        if isinstance(regions, str):
+            regions = self.regions(regions)
+        return fanout.iter_fanout([({"Region": r}, r) for r in regions],
+                                  lambda r: ec2h.iter_instances(self.session, r), self.max_workers, limiter)
+
+    # S3
+
+    @_mutates("s3")
+    def create_bucket(self, bucket_name: str, public: bool = False, confirm: str | None = None,
+                      region: str | None = None) -> dict:
+        return s3h.create_bucket(self.session, bucket_name, region or self.region, public, confirm, self.owner)
+
+    def upload_file(self, bucket_name: str, key: str, file_path: str, region: str | None = None) -> dict:
+        return s3h.upload_file(self.session, region or self.region, bucket_name, key, file_path)
+
+    def list_buckets(self) -> list[dict]:
+        return s3h.list_buckets(self.session)
+
+    # Route53
+
+    @_mutates("route53")
+    def create_zone(self, name: str) -> dict:
+        return r53h.create_zone(self.session, name, self.owner)
+
+    def list_zones(self) -> list[dict]:
+        return r53h.list_zones(self.session)
+
+    def get_nameservers(self, hosted_zone_id: str) -> list[str]:
+        return r53h.get_nameservers(self.session, hosted_zone_id)
+
+    def list_records(self, hosted_zone_id: str, name: str | None = None, rtype: str | None = None,
+                     prefix: bool = False) -> list[dict]:
+        return r53h.list_records(self.session, hosted_zone_id, name, rtype, prefix)
+
+    @_mutates("route53")
+    def upsert_record(self, hosted_zone_id: str, name: str, rtype: str, ttl: int, values: list[str]) -> dict:
+        return r53h.upsert_record(self.session, hosted_zone_id, name, rtype, ttl, values)
+
+    @_mutates("route53")
+    def delete_record(self, hosted_zone_id: str, name: str, rtype: str, values: list[str]) -> dict:
+        return r53h.delete_record(self.session, hosted_zone_id, name, rtype, values)
+
+    def changes(self) -> change_queue.ChangeCoalescer:
+        """Shared write-coalescing queue; submit() returns a Future per change."""
+        with self._lock:
+            if self._changes is None:
+                self._changes = change_queue.ChangeCoalescer(
+                    self.session, on_batch=lambda zid: result_cache.invalidate(self.scope, "route53"))
+            return self._changes
+
+    def export_zone(self, hosted_zone_id: str, out) -> dict:
+        return r53h.export_zone(self.session, hosted_zone_id, out)
+
+    @_mutates("route53")
+    def import_zone(self, hosted_zone_id: str, lines, origin: str | None = None,
+                    batch_size: int = r53h.BATCH_MAX_UPSERTS) -> dict:
+        return r53h.import_zone(self.session, hosted_zone_id, lines, origin, batch_size)
+
+    def snapshot(self, workers: int = 8, path: str | None = None) -> dict:
+        return zone_snapshot.take_snapshot(self.session, path or zone_snapshot.default_path(self.profile), workers)
+
+    def query_snapshot(self, path: str | None = None, **criteria) -> dict:
+        return zone_snapshot.query_snapshot(path or zone_snapshot.default_path(self.profile), **criteria)
+
+    def verify(self, hosted_zone_id: str, name: str, rtype: str = "A", values: list[str] | None = None,
+               timeout: float = 120.0, nameservers: list[str] | None = None) -> dict:
+        return dns_verify.verify_propagation(self.session, hosted_zone_id, name, rtype, values, timeout, nameservers)
+
+    # Discovery and inventory
+
+    def discover(self, kinds: list[str] | None = None, regions: list[str] | None = None):
+        kinds = list(kinds or tagging.RESOURCE_TYPES)
+        unknown = set(kinds) - set(tagging.RESOURCE_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown kinds: {sorted(unknown)}")
+        return tagging.discover(self.session, kinds, regions)
+
+    def refresh_inventory(self, kinds: list[str] | None = None, regions: list[str] | None = None,
+                          full: bool = False, path: str | None = None) -> dict:
+        kinds = list(kinds or inventory.KINDS)
+        unknown = set(kinds) - set(inventory.KINDS)
+        if unknown:
+            raise ValueError(f"Unknown kinds: {sorted(unknown)}")
+        return inventory.refresh(self.session, path or inventory.default_path(), self.scope, kinds, regions,
+                                 full, self.max_workers)
+
+    def query_inventory(self, kind: str, owner: str | None = None, state: str | None = None,
+                        itype: str | None = None, path: str | None = None) -> dict:
+        return inventory.query(path or inventory.default_path(), self.scope, kind, owner, state, itype)
+
+    def close(self):
+        """Flush pending coalesced changes."""
+        with self._lock:
+            changes, self._changes = self._changes, None
+        if changes is not None:
+            changes.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
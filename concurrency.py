@@ -0,0 +1,128 @@
+from __future__ import annotations
+import functools
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+THROTTLE_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestLimitExceeded",
+    "TooManyRequestsException", "RequestThrottled", "SlowDown", "PriorRequestNotComplete",
+}
+INITIAL = 4
+LATENCY_FACTOR = 2.0  # recent call latency this many times the usual counts as congestion
+RECENT_WEIGHT = 0.2   # EWMA weights of the recent and usual latency of one operation
+USUAL_WEIGHT = 0.02
+
+_local = threading.local()
+_latency: dict[tuple, list[float]] = {}
+_latency_lock = threading.Lock()
+
+
+def is_throttle(exc: BaseException) -> bool:
+    return isinstance(exc, ClientError) and exc.response.get("Error", {}).get("Code") in THROTTLE_CODES
+
+
+def _observe(key: tuple, seconds: float) -> bool:
+    """Fold one call latency into the averages of `key`; True when the recent
+    average has risen to LATENCY_FACTOR times the usual one."""
+    with _latency_lock:
+        avg = _latency.get(key)
+        if avg is None:
+            avg = _latency[key] = [seconds, seconds]
+        else:
+            avg[0] += RECENT_WEIGHT * (seconds - avg[0])
+            avg[1] += USUAL_WEIGHT * (seconds - avg[1])
+        return avg[0] > avg[1] * LATENCY_FACTOR
+
+
+def _before_call(context=None, **kwargs):
+    if context is not None:
+        context["limiter_started"] = time.monotonic()
+
+
+def _after_call(service: str, region: str | None, parsed=None, model=None, context=None, **kwargs):
+    # With adaptive retries most throttles are absorbed by botocore; a retried
+    # call is still the earliest sign of congestion, so flag it for the task.
+    if parsed and parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0) > 0:
+        _local.retried = True
+    # Latency is compared per service, region and operation: a far region or a
+    # heavy operation is slow without being congested.
+    started = (context or {}).get("limiter_started")
+    if started is not None and model is not None:
+        if _observe((service, region, model.name), time.monotonic() - started):
+            _local.slow = True
+
+
+def install(client):
+    ev = client.meta.events
+    ev.register("before-parameter-build", _before_call)
+    ev.register("after-call", functools.partial(_after_call, client.meta.service_model.service_name,
+                                                client.meta.region_name))
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit shared by the tasks of one fan-out.
+
+    The limit starts at `initial` and, until the first cut, each healthy
+    completion adds 1 (so it doubles every round of tasks); after that each
+    adds 1/limit (about +1 per round), up to `ceiling`. A throttle, a retried
+    call or a rising call latency (see _observe) halves it, at most once per
+    average task duration, down to `floor`.
+    """
+
+    def __init__(self, ceiling: int, initial: int = INITIAL, floor: int = 1):
+        if ceiling < 1:
+            raise ValueError("ceiling must be >= 1")
+        self.ceiling = ceiling
+        self.floor = max(1, min(floor, ceiling))
+        self.limit = float(max(self.floor, min(initial, ceiling)))
+        self.peak = int(self.limit)
+        self.throttles = 0
+        self.slow = 0
+        self.decreases = 0
+        self._active = 0
+        self._avg = None
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._active >= int(self.limit):
+                self._cond.wait()
+            self._active += 1
+
+    def release(self, latency: float, throttled: bool = False, slow: bool = False):
+        with self._cond:
+            self._active -= 1
+            if throttled or slow:
+                self.throttles += throttled
+                self.slow += slow and not throttled
+                now = time.monotonic()
+                if now - self._last_cut >= (self._avg or 0.0):
+                    self.limit = max(self.floor, self.limit / 2)
+                    self.decreases += 1
+                    self._last_cut = now
+            else:
+                self._avg = latency if self._avg is None else 0.9 * self._avg + 0.1 * latency
+                self.limit = min(self.ceiling, self.limit + (1 / self.limit if self.decreases else 1))
+                self.peak = max(self.peak, int(self.limit))
+            self._cond.notify_all()
+
+    def run(self, fn, *args):
+        """Call fn(*args) inside one concurrency slot, feeding the outcome back."""
+        self.acquire()
+        _local.retried = _local.slow = False
+        started = time.monotonic()
+        throttled = False
+        try:
+            return fn(*args)
+        except Exception as e:
+            throttled = is_throttle(e)
+            raise
+        finally:
+            self.release(time.monotonic() - started, throttled or _local.retried, _local.slow)
+
+    def report(self) -> dict:
+        return {"Concurrency": int(self.limit), "Peak": self.peak, "Ceiling": self.ceiling,
+                "Throttled": self.throttles, "Slow": self.slow, "Decreases": self.decreases}
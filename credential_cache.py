@@ -0,0 +1,56 @@
+"""On-disk cache of temporary credentials for assumed-role profiles.
+
+Without it every run of a `role_arn` profile calls sts:AssumeRole (and asks
+for an MFA code when the profile has `mfa_serial`). The assume-role providers
+of each session get a JSONFileCache in the tool's cache dir (0700 directory,
+0600 files), the same mechanism the AWS CLI uses with ~/.aws/cli/cache:
+botocore reuses a cached entry until 15 minutes before it expires and writes
+the new one after refreshing.
+"""
+from __future__ import annotations
+import threading
+
+from botocore.exceptions import BotoCoreError
+from botocore.exceptions import ClientError
+from botocore.utils import JSONFileCache
+
+from utils import cache_dir
+
+CACHED_PROVIDERS = ("assume-role", "assume-role-with-web-identity")
+REFRESH_INTERVAL = 60.0
+
+
+def install(core):
+    """Give the botocore session's assume-role providers the shared file cache."""
+    cache = JSONFileCache(cache_dir("credentials"))
+    resolver = core.get_component("credential_provider")
+    for name in CACHED_PROVIDERS:
+        provider = resolver.get_provider(name)
+        if provider is not None:
+            provider.cache = cache
+
+
+def _refresh(session):
+    if session._session.get_scoped_config().get("mfa_serial"):
+        return  # needs a code from a person; the next command will prompt
+    creds = session.get_credentials()
+    if creds is not None and getattr(creds, "refresh_needed", lambda: False)():
+        creds.get_frozen_credentials()  # refreshes and rewrites the cache entry
+
+
+def refresh_in_background(sessions, interval: float = REFRESH_INTERVAL) -> threading.Event:
+    """For long-lived processes (the daemon): every `interval` seconds, refresh
+    the credentials of `sessions()` that entered botocore's refresh window, so
+    commands never wait on STS. Set the returned event to stop."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            for session in sessions():
+                try:
+                    _refresh(session)
+                except (BotoCoreError, ClientError):
+                    pass  # the next command that needs them reports the error
+
+    threading.Thread(target=loop, name="maromtool-credentials", daemon=True).start()
+    return stop
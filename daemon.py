@@ -0,0 +1,239 @@
+"""Opt-in local daemon that runs CLI commands in a warm process.
+
+`maromtool.py daemon` listens on a Unix socket; a regular invocation that
+finds the socket forwards its argv and streams stdout/stderr and the exit
+code back, skipping interpreter-level imports, credential resolution,
+service-model loading and TLS handshakes. Without a daemon (or when it
+refuses the request) the CLI simply runs in-process.
+
+This module is imported on the CLI's fast path, so it must stay free of
+boto3/botocore imports.
+"""
+from __future__ import annotations
+import contextlib
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+
+IDLE_TIMEOUT = 900.0
+_HEADER = struct.Struct("!cI")  # channel, payload length
+# Commands that depend on per-process state the daemon cannot share:
+# process-wide collectors (--stats/--trace) and the caller's stdin.
+_LOCAL_FLAGS = {"--stats", "--stats-file", "--trace"}
+
+
+def socket_path() -> str:
+    # Mirrors utils.cache_dir() without importing botocore.
+    explicit = os.environ.get("MAROMTOOL_DAEMON_SOCKET")
+    if explicit:
+        return explicit
+    base = os.environ.get("MAROMTOOL_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "maromtool")
+    return os.path.join(base, "daemon.sock")
+
+
+def env_fingerprint() -> dict:
+    """Environment that changes what a command does; the daemon only serves
+    callers whose environment matches its own."""
+    return {k: v for k, v in os.environ.items()
+            if (k.startswith("AWS_") or k.startswith("MAROMTOOL_"))
+            and k not in ("MAROMTOOL_NO_DAEMON", "MAROMTOOL_DAEMON_SOCKET")}
+
+
+def _send(sock, channel: bytes, payload: bytes = b""):
+    sock.sendall(_HEADER.pack(channel, len(payload)) + payload)
+
+
+def _recv_exact(f, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise ConnectionError("daemon closed the connection")
+    return data
+
+
+def _request(path: str, req: dict, timeout: float | None = None):
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    s.connect(path)
+    s.sendall(json.dumps(req).encode() + b"\n")
+    return s
+
+
+# -- client side ---------------------------------------------------------------
+
+def forwardable(argv: list[str]) -> bool:
+    if os.environ.get("MAROMTOOL_NO_DAEMON") or not argv or "daemon" in argv[:1]:
+        return False
+    if any(a.split("=", 1)[0] in _LOCAL_FLAGS for a in argv):
+        return False
+    return not ("import" in argv and "-" in argv)
+
+
+def forward(argv: list[str]) -> int | None:
+    """Run argv in the daemon and return its exit code, or None to run in-process."""
+    if not forwardable(argv):
+        return None
+    path = socket_path()
+    try:
+        s = _request(path, {"op": "run", "argv": argv, "cwd": os.getcwd(), "env": env_fingerprint()})
+    except OSError:
+        return None
+    started = False
+    with s, s.makefile("rb") as f:
+        try:
+            while True:
+                channel, size = _HEADER.unpack(_recv_exact(f, _HEADER.size))
+                payload = _recv_exact(f, size)
+                if channel == b"r":  # refused before running anything
+                    return None
+                if channel == b"x":
+                    return int(payload)
+                started = True
+                stream = sys.stdout if channel == b"o" else sys.stderr
+                stream.write(payload.decode("utf-8"))
+                stream.flush()
+        except BrokenPipeError:  # our own stdout went away (e.g. piped into head)
+            return 1
+        except (OSError, ConnectionError):
+            if not started:
+                return None
+            print("maromtool: lost connection to the daemon", file=sys.stderr)
+            return 1
+
+
+def control(op: str, timeout: float = 5.0) -> dict | None:
+    """Send 'status' or 'stop'; None when no daemon answers."""
+    try:
+        s = _request(socket_path(), {"op": op}, timeout)
+    except OSError:
+        return None
+    with s, s.makefile("rb") as f:
+        try:
+            channel, size = _HEADER.unpack(_recv_exact(f, _HEADER.size))
+            return json.loads(_recv_exact(f, size))
+        except (OSError, ConnectionError, ValueError):
+            return None
+
+
+# -- server side ---------------------------------------------------------------
+
+class _ChannelWriter:
+    """File-like object that frames text writes onto one channel of the socket."""
+
+    def __init__(self, sock, channel: bytes):
+        self.sock = sock
+        self.channel = channel
+        self.encoding = "utf-8"
+
+    def write(self, text: str) -> int:
+        if text:
+            _send(self.sock, self.channel, text.encode("utf-8"))
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+
+class Daemon:
+    """Serves requests one at a time: cwd, stdout and the stats/throttle
+    configuration are process-wide, so commands must not overlap. Each command
+    still runs its own fan-out in parallel."""
+
+    def __init__(self, path: str, run_cli, idle_timeout: float = IDLE_TIMEOUT):
+        self.path = path
+        self.run_cli = run_cli
+        self.idle_timeout = idle_timeout
+        self.env = env_fingerprint()
+        self.started = time.time()
+        self.requests = 0
+        self.last_active = time.monotonic()
+        self._busy = threading.Lock()
+        self._server = None
+
+    def _run(self, sock, req: dict):
+        if req.get("env") != self.env:
+            _send(sock, b"r", b"environment differs from the daemon's")
+            return
+        out, err = _ChannelWriter(sock, b"o"), _ChannelWriter(sock, b"e")
+        with self._busy:
+            self.requests += 1
+            code = 0
+            try:
+                os.chdir(req["cwd"])
+                with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                    try:
+                        self.run_cli(list(req["argv"]))
+                    except SystemExit as e:
+                        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                        if not isinstance(e.code, (int, type(None))):
+                            print(e.code, file=sys.stderr)
+                    except Exception:  # keep serving; report like an uncaught error would
+                        traceback.print_exc(file=sys.stderr)
+                        code = 1
+            finally:
+                self.last_active = time.monotonic()
+            _send(sock, b"x", str(code).encode())
+
+    def status(self) -> dict:
+        return {"Pid": os.getpid(), "Socket": self.path, "UptimeSeconds": round(time.time() - self.started),
+                "Requests": self.requests, "IdleTimeout": self.idle_timeout,
+                "IdleSeconds": round(time.monotonic() - self.last_active)}
+
+    def handle(self, sock):
+        with sock.makefile("rb") as f:
+            req = json.loads(f.readline() or b"{}")
+        op = req.get("op")
+        if op == "run":
+            self._run(sock, req)
+        elif op in ("status", "stop"):
+            _send(sock, b"s", json.dumps(self.status()).encode())
+            if op == "stop":
+                threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _watch_idle(self):
+        while True:
+            time.sleep(min(1.0, self.idle_timeout))
+            if not self._busy.locked() and time.monotonic() - self.last_active >= self.idle_timeout:
+                self._server.shutdown()
+                return
+
+    def serve_forever(self):
+        import socketserver
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                try:
+                    daemon.handle(self.request)
+                except (OSError, ValueError):
+                    pass  # client went away or sent garbage
+
+        if control("status", timeout=1.0) is not None:
+            raise RuntimeError(f"A daemon is already listening on {self.path}")
+        os.makedirs(os.path.dirname(self.path) or ".", mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket from a daemon that died
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+        old_umask = os.umask(0o177)
+        try:
+            self._server = Server(self.path, Handler)
+        finally:
+            os.umask(old_umask)
+        threading.Thread(target=self._watch_idle, daemon=True).start()
+        try:
+            self._server.serve_forever(poll_interval=0.5)
+        finally:
+            self._server.server_close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,273 @@
+from __future__ import annotations
+import asyncio
+import ipaddress
+import random
+import socket
+import struct
+import time
+
+import boto3
+import route53_handler as r53h
+
+TYPE_CODES = {"A": 1, "NS": 2, "CNAME": 5, "SOA": 6, "PTR": 12, "MX": 15, "TXT": 16, "AAAA": 28, "SRV": 33}
+TYPE_NAMES = {v: k for k, v in TYPE_CODES.items()}
+QUERY_TIMEOUT = 2.0
+BACKOFF_START, BACKOFF_MAX = 0.5, 8.0
+
+
+# --- wire format -----------------------------------------------------------
+
+def _encode_name(name: str) -> bytes:
+    out = b""
+    for label in name.rstrip(".").split("."):
+        if label:
+            raw = label.encode("idna") if not label.isascii() else label.encode()
+            out += bytes([len(raw)]) + raw
+    return out + b"\x00"
+
+
+def build_query(qid: int, name: str, rtype: str) -> bytes:
+    # No recursion desired: we ask each authoritative server directly.
+    return struct.pack("!HHHHHH", qid, 0, 1, 0, 0, 0) + _encode_name(name) + struct.pack("!HH", TYPE_CODES[rtype], 1)
+
+
+def _read_name(data: bytes, off: int) -> tuple[str, int]:
+    labels, end, jumps = [], None, 0
+    while True:
+        length = data[off]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = off + 2
+            off = ((length & 0x3F) << 8) | data[off + 1]
+            jumps += 1
+            if jumps > 64:
+                raise ValueError("DNS name compression loop")
+            continue
+        off += 1
+        if length == 0:
+            break
+        labels.append(data[off:off + length].decode("ascii", "replace"))
+        off += length
+    return ".".join(labels) + ".", end if end is not None else off
+
+
+def _decode_rdata(data: bytes, off: int, rdlen: int, rtype: int) -> str:
+    rd = data[off:off + rdlen]
+    if rtype == 1:
+        return str(ipaddress.IPv4Address(rd))
+    if rtype == 28:
+        return str(ipaddress.IPv6Address(rd))
+    if rtype in (2, 5, 12):
+        return _read_name(data, off)[0]
+    if rtype == 15:
+        return f"{struct.unpack('!H', rd[:2])[0]} {_read_name(data, off + 2)[0]}"
+    if rtype == 33:
+        prio, weight, port = struct.unpack("!HHH", rd[:6])
+        return f"{prio} {weight} {port} {_read_name(data, off + 6)[0]}"
+    if rtype == 16:
+        parts, i = [], 0
+        while i < len(rd):
+            n = rd[i]
+            parts.append('"' + rd[i + 1:i + 1 + n].decode("utf-8", "replace").replace('"', '\\"') + '"')
+            i += 1 + n
+        return " ".join(parts)
+    if rtype == 6:
+        mname, o = _read_name(data, off)
+        rname, o = _read_name(data, o)
+        return " ".join([mname, rname] + [str(x) for x in struct.unpack("!IIIII", data[o:o + 20])])
+    return rd.hex()
+
+
+def parse_response(data: bytes) -> tuple[int, int, list[tuple[str, str, str]]]:
+    """Return (query id, rcode, [(owner, type, value), ...]) for the answer section."""
+    qid, flags, qd, an, _, _ = struct.unpack("!HHHHHH", data[:12])
+    off = 12
+    for _ in range(qd):
+        off = _read_name(data, off)[1] + 4
+    answers = []
+    for _ in range(an):
+        owner, off = _read_name(data, off)
+        rtype, _, _, rdlen = struct.unpack("!HHIH", data[off:off + 10])
+        off += 10
+        answers.append((owner.lower(), TYPE_NAMES.get(rtype, str(rtype)), _decode_rdata(data, off, rdlen, rtype)))
+        off += rdlen
+    return qid, flags & 0x000F, answers
+
+
+def normalize_value(rtype: str, value: str) -> str:
+    if rtype in ("A", "AAAA"):
+        try:
+            return str(ipaddress.ip_address(value))
+        except ValueError:
+            return value
+    value = " ".join(value.split())
+    return value if rtype == "TXT" else value.lower().rstrip(".")
+
+
+# --- asyncio client --------------------------------------------------------
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, qid: int):
+        self.qid = qid
+        self.answer: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        try:
+            parsed = parse_response(data)
+        except (ValueError, IndexError, struct.error) as e:
+            if not self.answer.done():
+                self.answer.set_exception(ValueError(f"Malformed DNS response: {e}"))
+            return
+        if parsed[0] == self.qid and not self.answer.done():
+            self.answer.set_result(parsed)
+
+    def error_received(self, exc):
+        if not self.answer.done():
+            self.answer.set_exception(exc)
+
+
+async def query(address: str, port: int, name: str, rtype: str, timeout: float = QUERY_TIMEOUT) -> list[str]:
+    """Send one UDP query and return the values of the matching answer records."""
+    loop = asyncio.get_running_loop()
+    qid = random.randrange(1 << 16)
+    transport, proto = await loop.create_datagram_endpoint(lambda: _QueryProtocol(qid), remote_addr=(address, port))
+    try:
+        transport.sendto(build_query(qid, name, rtype))
+        _, rcode, answers = await asyncio.wait_for(proto.answer, timeout)
+    finally:
+        transport.close()
+    if rcode not in (0, 3):  # NOERROR / NXDOMAIN
+        raise RuntimeError(f"DNS rcode {rcode}")
+    owner = name.lower() if name.endswith(".") else name.lower() + "."
+    return [v for o, t, v in answers if o == owner and t == rtype]
+
+
+async def _watch_server(label: str, address: str, port: int, name: str, rtype: str,
+                        expected: set[str], deadline: float, started: float) -> dict:
+    attempts, delay, values, latency, error = 0, BACKOFF_START, [], None, None
+    while True:
+        attempts += 1
+        t0 = time.monotonic()
+        try:
+            values = await query(address, port, name, rtype, min(QUERY_TIMEOUT, max(0.1, deadline - t0)))
+            latency, error = round((time.monotonic() - t0) * 1000, 2), None
+        except (OSError, RuntimeError, ValueError, asyncio.TimeoutError) as e:
+            error = str(e) or type(e).__name__
+        if error is None and {normalize_value(rtype, v) for v in values} == expected:
+            return {"Server": label, "Address": address, "Converged": True, "Attempts": attempts, "LatencyMs": latency,
+                    "ConvergedAfterSeconds": round(time.monotonic() - started, 3), "Values": values}
+        if time.monotonic() + delay > deadline:
+            return {"Server": label, "Address": address, "Converged": False, "Attempts": attempts, "LatencyMs": latency,
+                    "Values": values, "Error": error}
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, BACKOFF_MAX)
+
+
+async def _resolve(host: str, port: int) -> str:
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+    return infos[0][4][0]
+
+
+async def verify_async(nameservers: list[tuple[str, int]], name: str, rtype: str, expected: list[str],
+                       timeout: float = 120.0) -> dict:
+    """Poll every nameserver concurrently until all return `expected` or `timeout` passes."""
+    started = time.monotonic()
+    deadline = started + timeout
+    want = {normalize_value(rtype, v) for v in expected}
+
+    async def one(host, port):
+        try:
+            address = await _resolve(host, port)
+        except OSError as e:
+            return {"Server": host, "Converged": False, "Attempts": 0, "Error": str(e)}
+        return await _watch_server(host, address, port, name, rtype, want, deadline, started)
+
+    servers = await asyncio.gather(*(one(h, p) for h, p in nameservers))
+    converged = all(s["Converged"] for s in servers)
+    return {"Name": name, "Type": rtype, "Expected": sorted(expected), "Converged": converged,
+            "ConvergenceSeconds": max(s["ConvergedAfterSeconds"] for s in servers) if converged and servers else None,
+            "Servers": servers}
+
+
+def _split_server(spec: str, default_port: int) -> tuple[str, int]:
+    host, sep, port = spec.rpartition(":")
+    if sep and port.isdigit() and ":" not in host:
+        return host, int(port)
+    return spec, default_port
+
+
+def verify_propagation(session: boto3.Session, hosted_zone_id: str, name: str, rtype: str = "A",
+                       values: list[str] | None = None, timeout: float = 120.0,
+                       nameservers: list[str] | None = None, port: int = 53):
+    """Check that every authoritative nameserver of the zone serves the expected values.
+
+    Expected values default to what Route53 currently holds for name/type; the
+    nameservers default to the zone's delegation set.
+    """
+    if values is None:
+        found = r53h.list_records(session, hosted_zone_id, name, rtype)
+        values = found[0]["Values"] if found and isinstance(found[0]["Values"], list) else []
+        if not values:
+            raise ValueError(f"No {rtype} record named {name} in zone (pass --values explicitly)")
+    servers = [_split_server(s, port) for s in (nameservers or r53h.get_nameservers(session, hosted_zone_id))]
+    fqdn = name if name.endswith(".") else name + "."
+    return asyncio.run(verify_async(servers, fqdn, rtype, values, timeout))
+
+
+# --- stub server (stands in for the authoritative servers in tests) --------
+
+def _encode_rdata(rtype: str, value: str) -> bytes:
+    if rtype in ("A", "AAAA"):
+        return ipaddress.ip_address(value).packed
+    if rtype in ("CNAME", "NS", "PTR"):
+        return _encode_name(value)
+    if rtype == "MX":
+        pref, host = value.split(None, 1)
+        return struct.pack("!H", int(pref)) + _encode_name(host)
+    if rtype == "TXT":
+        out = b""
+        for part in value.split('" "'):
+            raw = part.strip('"').encode()
+            out += bytes([len(raw)]) + raw
+        return out
+    raise ValueError(f"Stub server cannot encode {rtype}")
+
+
+class StubDNSServer(asyncio.DatagramProtocol):
+    """Minimal authoritative UDP server answering from a {(name, type): [values]} dict.
+
+    `records` may be mutated while serving to simulate propagation.
+    """
+
+    def __init__(self, records: dict):
+        self.records = records
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        qid = struct.unpack("!H", data[:2])[0]
+        qname, off = _read_name(data, 12)
+        qtype, _ = struct.unpack("!HH", data[off:off + 4])
+        question = data[12:off + 4]
+        rtype = TYPE_NAMES.get(qtype)
+        values = self.records.get((qname.lower(), rtype), []) if rtype else []
+        answers = b""
+        for v in values:
+            rdata = _encode_rdata(rtype, v)
+            answers += b"\xc0\x0c" + struct.pack("!HHIH", qtype, 1, 60, len(rdata)) + rdata
+        header = struct.pack("!HHHHHH", qid, 0x8400, 1, len(values), 0, 0)
+        self.transport.sendto(header + question + answers, addr)
+
+    @classmethod
+    async def start(cls, records: dict, host: str = "127.0.0.1", port: int = 0):
+        """Return (server, transport, bound port)."""
+        transport, proto = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: cls(records), local_addr=(host, port))
+        return proto, transport, transport.get_extra_info("sockname")[1]
@@ -1,13 +1,22 @@
 from __future__ import annotations
+import time
+import uuid
+
 import boto3
+import cap_lock
+import launch_templates
 from botocore.exceptions import ClientError
 from typing import List, Dict
-from utils import get_common_tags, tags_list_to_dict, CREATED_BY_KEY, CREATED_BY_VAL
+from utils import get_common_tags, tags_list_to_dict, client_for, account_id, CREATED_BY_KEY, CREATED_BY_VAL
 
 EC2_ALLOWED_TYPES = {"t3.micro", "t2.small"}
+EC2_CAP = 2
+# Launches made under the cap lock are counted for this long even if
+# DescribeInstances does not list them yet.
+RECENT_LAUNCH_WINDOW = 300.0
 
-def _ec2_client(session: boto3.Session):
-    return session.client("ec2")
+def _ec2_client(session: boto3.Session, region: str | None = None):
+    return client_for(session, "ec2", region)
 
 def latest_ami(session: boto3.Session, os_choice: str):
     ec2 = _ec2_client(session)
@@ -27,34 +36,100 @@ def latest_ami(session: boto3.Session, os_choice: str):
     imgs.sort(key=lambda x: x["CreationDate"], reverse=True)
     return imgs[0]["ImageId"]
 
-def _running_cli_instances_count(ec2) -> int:
-    resp = ec2.describe_instances(Filters=[
+def _running_cli_instance_ids(ec2) -> set[str]:
+    ids = set()
+    for page in ec2.get_paginator("describe_instances").paginate(Filters=[
         {"Name": f"tag:{CREATED_BY_KEY}", "Values": [CREATED_BY_VAL]},
         {"Name": "instance-state-name", "Values": ["pending", "running"]},
-    ])
-    return sum(len(r["Instances"]) for r in resp.get("Reservations", []))
+    ]):
+        ids.update(i["InstanceId"] for r in page.get("Reservations", []) for i in r.get("Instances", []))
+    return ids
+
+def _may_be_running(ec2, instance_ids: list[str]) -> set[str]:
+    """Those of `instance_ids` that are pending/running or not visible yet."""
+    if not instance_ids:
+        return set()
+    try:
+        d = ec2.describe_instances(InstanceIds=instance_ids)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "InvalidInstanceID.NotFound":
+            raise
+        if len(instance_ids) == 1:
+            return set(instance_ids)  # launched moments ago and not visible yet
+        return set().union(*(_may_be_running(ec2, [i]) for i in instance_ids))
+    states = {i["InstanceId"]: i["State"]["Name"] for r in d.get("Reservations", []) for i in r.get("Instances", [])}
+    return {i for i in instance_ids if states.get(i, "pending") in ("pending", "running")}
 
-def create_instance(session: boto3.Session, instance_type: str, os_choice: str, owner: str | None):
+def _running_cli_instances_count(ec2, recent: list[str] = ()) -> int:
+    """Pending/running CLI instances, counting `recent` launches that
+    DescribeInstances (eventually consistent) may not filter in yet."""
+    ids = _running_cli_instance_ids(ec2)
+    return len(ids | _may_be_running(ec2, [i for i in recent if i not in ids]))
+
+def _instance_by_token(ec2, client_token: str) -> dict | None:
+    d = ec2.describe_instances(Filters=[{"Name": "client-token", "Values": [client_token]}])
+    insts = [i for r in d.get("Reservations", []) for i in r.get("Instances", [])]
+    return insts[0] if insts else None
+
+def _run_from_template(ec2, tpl: dict, tag_spec: list[dict], client_token: str):
+    return ec2.run_instances(
+        LaunchTemplate={"LaunchTemplateId": tpl["LaunchTemplateId"], "Version": str(tpl["Version"])},
+        MinCount=1, MaxCount=1,
+        TagSpecifications=tag_spec,
+        ClientToken=client_token,
+    )
+
+def create_instance(session: boto3.Session, instance_type: str, os_choice: str, owner: str | None,
+                    client_token: str | None = None, lock: str | None = None):
+    """Launch from the (os, type) launch template (see launch_templates), under
+    the cap lock (see cap_lock), with an idempotency ClientToken.
+
+    Re-running with the ClientToken of an earlier call returns that call's
+    instance instead of launching (and counting against the cap) again.
+    """
     if instance_type not in EC2_ALLOWED_TYPES:
         raise ValueError(f"instance_type must be one of {sorted(EC2_ALLOWED_TYPES)}")
 
     ec2 = _ec2_client(session)
-    if _running_cli_instances_count(ec2) >= 2:
-        raise RuntimeError("Hard cap reached: 2 running CLI instances already exist")
+    if client_token:
+        inst = _instance_by_token(ec2, client_token)
+        if inst is not None:
+            return {"InstanceId": inst["InstanceId"], "State": inst["State"]["Name"], "AMI": inst.get("ImageId"),
+                    "Type": inst["InstanceType"], "ClientToken": client_token, "Replayed": True}
+    client_token = client_token or str(uuid.uuid4())
 
-    ami = latest_ami(session, os_choice)
+    profile = session.profile_name
     tags = get_common_tags(owner)
     tag_spec = [{"ResourceType": "instance", "Tags": tags},
                 {"ResourceType": "volume", "Tags": tags}]
 
-    res = ec2.run_instances(
-        ImageId=ami,
-        InstanceType=instance_type,
-        MinCount=1, MaxCount=1,
-        TagSpecifications=tag_spec
-    )
-    inst = res["Instances"][0]
-    return {"InstanceId": inst["InstanceId"], "State": inst["State"]["Name"], "AMI": ami, "Type": instance_type}
+    region = ec2.meta.region_name
+    # The cap is per account and region; a shared lock table may serve several accounts.
+    cap = cap_lock.backend(lock, session, f"ec2-cap-{account_id(session)}-{region}")
+    with cap_lock.held(cap) as state:
+        now = time.time()
+        recent = [launch for launch in state.get("launches", []) if now - launch["At"] < RECENT_LAUNCH_WINDOW]
+        state["launches"] = recent
+        if _running_cli_instances_count(ec2, [launch["InstanceId"] for launch in recent]) >= EC2_CAP:
+            raise RuntimeError(f"Hard cap reached: {EC2_CAP} running CLI instances already exist")
+        # Under the lock too, so concurrent cold starts or AMI changes do not race
+        # to create the template or its versions.
+        tpl = launch_templates.ensure(ec2, profile, os_choice, instance_type, lambda: latest_ami(session, os_choice))
+        cap.confirm()
+        try:
+            res = _run_from_template(ec2, tpl, tag_spec, client_token)
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in launch_templates.GONE_CODES:
+                raise
+            launch_templates.forget(ec2, profile, os_choice, instance_type)
+            tpl = launch_templates.ensure(ec2, profile, os_choice, instance_type, lambda: latest_ami(session, os_choice))
+            cap.confirm()
+            res = _run_from_template(ec2, tpl, tag_spec, client_token)
+        inst = res["Instances"][0]
+        state["launches"].append({"InstanceId": inst["InstanceId"], "At": now})
+    return {"InstanceId": inst["InstanceId"], "State": inst["State"]["Name"], "AMI": tpl["ImageId"],
+            "Type": instance_type, "ClientToken": client_token,
+            "LaunchTemplate": {"Id": tpl["LaunchTemplateId"], "Name": tpl["LaunchTemplateName"], "Version": tpl["Version"]}}
 
 def _instance_has_cli_tag(ec2, instance_id: str) -> bool:
     d = ec2.describe_instances(InstanceIds=[instance_id])
@@ -78,19 +153,24 @@ def stop_instance(session: boto3.Session, instance_id: str):
     ec2.stop_instances(InstanceIds=[instance_id])
     return {"InstanceId": instance_id, "Action": "stop", "Status": "initiated"}
 
-def list_instances(session: boto3.Session):
-    ec2 = _ec2_client(session)
-    resp = ec2.describe_instances(Filters=[
+def iter_instances(session: boto3.Session, region: str | None = None, with_tags: bool = False):
+    ec2 = _ec2_client(session, region)
+    paginator = ec2.get_paginator("describe_instances")
+    for page in paginator.paginate(Filters=[
         {"Name": f"tag:{CREATED_BY_KEY}", "Values": [CREATED_BY_VAL]}
-    ])
-    out = []
-    for r in resp.get("Reservations", []):
-        for i in r.get("Instances", []):
-            out.append({
-                "InstanceId": i.get("InstanceId"),
-                "State": i.get("State", {}).get("Name"),
-                "Type": i.get("InstanceType"),
-                "PrivateIp": i.get("PrivateIpAddress"),
-                "PublicIp": i.get("PublicIpAddress"),
-            })
-    return out
+    ]):
+        for r in page.get("Reservations", []):
+            for i in r.get("Instances", []):
+                item = {
+                    "InstanceId": i.get("InstanceId"),
+                    "State": i.get("State", {}).get("Name"),
+                    "Type": i.get("InstanceType"),
+                    "PrivateIp": i.get("PrivateIpAddress"),
+                    "PublicIp": i.get("PublicIpAddress"),
+                }
+                if with_tags:
+                    item["Tags"] = tags_list_to_dict(i.get("Tags", []))
+                yield item
+
+def list_instances(session: boto3.Session, region: str | None = None):
+    return list(iter_instances(session, region))
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+import boto3
+import concurrency
+from botocore.exceptions import BotoCoreError, ClientError
+from utils import cache_dir, client_for
+
+DEFAULT_WORKERS = 16
+REGIONS_TTL = 24 * 3600
+_TARGET_ERRORS = (ClientError, BotoCoreError, ValueError, PermissionError, RuntimeError, OSError)
+
+
+def resolve_profiles(spec: str) -> list[str]:
+    """Expand --profiles: 'all-from-config' or a comma-separated list."""
+    if spec == "all-from-config":
+        profiles = sorted(boto3.Session().available_profiles)
+    else:
+        profiles = [p.strip() for p in spec.split(",") if p.strip()]
+    if not profiles:
+        raise ValueError("--profiles matched no profiles")
+    return profiles
+
+
+def resolve_regions(session: boto3.Session, spec: str, profile: str | None = None) -> list[str]:
+    """Expand --regions: 'all' (enabled regions, cached for a day) or a comma-separated list."""
+    if spec != "all":
+        regions = [r.strip() for r in spec.split(",") if r.strip()]
+        if not regions:
+            raise ValueError("--regions needs 'all' or at least one region")
+        return regions
+    path = os.path.join(cache_dir(), f"regions-{profile or 'default'}.json")
+    try:
+        if time.time() - os.path.getmtime(path) < REGIONS_TTL:
+            with open(path, encoding="utf-8") as fh:
+                return json.load(fh)
+    except (OSError, ValueError):
+        pass
+    ec2 = client_for(session, "ec2", session.region_name or "us-east-1")
+    regions = sorted(r["RegionName"] for r in ec2.describe_regions()["Regions"])
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(regions, fh)
+    os.replace(tmp, path)
+    return regions
+
+
+def iter_fanout(targets: list[tuple[dict, object]], fn, max_workers: int = DEFAULT_WORKERS,
+                limiter: concurrency.AdaptiveLimiter | None = None):
+    """Run fn(arg) for every (tags, arg) target in worker threads.
+
+    Items are yielded tagged with the target's tags as soon as that target
+    finishes, so the whole sweep takes about as long as the slowest target.
+    A failing target yields one item carrying its error instead of stopping the others.
+    How many targets run at once is steered by `limiter` (AIMD, up to max_workers).
+    """
+    if not targets:
+        return
+    limiter = limiter or concurrency.AdaptiveLimiter(max(1, min(max_workers, len(targets))))
+    with ThreadPoolExecutor(max_workers=max(1, min(limiter.ceiling, len(targets)))) as pool:
+        futures = {pool.submit(limiter.run, lambda a=arg: list(fn(a))): tags for tags, arg in targets}
+        for fut in as_completed(futures):
+            tags = futures[fut]
+            try:
+                items = fut.result()
+            except _TARGET_ERRORS as e:
+                yield {**tags, "Error": str(e)}
+                continue
+            for item in items:
+                yield {**tags, **item}
+
+
+def _prepare_account(make_session, profile: str, region: str | None, regions_spec: str | None):
+    session = make_session(profile, region)
+    if session.get_credentials() is None:
+        raise RuntimeError("No credentials resolved for profile")
+    account = client_for(session, "sts").get_caller_identity()["Account"]
+    if regions_spec:
+        regions = resolve_regions(session, regions_spec, profile)
+    else:
+        regions = [session.region_name]
+    return session, account, regions
+
+
+def iter_account_fanout(make_session, profiles: list[str], fn, region: str | None = None,
+                        regions_spec: str | None = None, global_service: bool = False,
+                        max_workers: int = DEFAULT_WORKERS, limiter: concurrency.AdaptiveLimiter | None = None):
+    """Run fn(session, region) for every profile (and region) with bounded parallelism.
+
+    Credentials are resolved concurrently and each account's regions are queued
+    as soon as that account is ready, so a slow or failing profile never holds
+    up the others. Items are tagged with Profile, Account and (unless
+    `global_service`) Region.
+    """
+    limiter = limiter or concurrency.AdaptiveLimiter(max_workers)
+    with ThreadPoolExecutor(max_workers=limiter.ceiling) as pool:
+        pending = {pool.submit(limiter.run, _prepare_account, make_session, p, region, None if global_service else regions_spec):
+                   (True, {"Profile": p}) for p in profiles}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                preparing, tags = pending.pop(fut)
+                try:
+                    res = fut.result()
+                except _TARGET_ERRORS as e:
+                    yield {**tags, "Error": str(e)}
+                    continue
+                if not preparing:
+                    for item in res:
+                        yield {**tags, **item}
+                    continue
+                session, account, regions = res
+                for r in ([None] if global_service else regions):
+                    run_tags = {**tags, "Account": account, **({} if global_service else {"Region": r})}
+                    pending[pool.submit(limiter.run, lambda s=session, r=r: list(fn(s, r)))] = (False, run_tags)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import boto3
+import ec2_handler as ec2h
+import fanout
+import route53_handler as r53h
+import s3_handler as s3h
+import tagging
+from utils import cache_dir, client_for, tags_list_to_dict, CREATED_BY_KEY, CREATED_BY_VAL, OWNER_KEY
+
+KINDS = ("ec2", "s3", "route53")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    scope TEXT, region TEXT, id TEXT, state TEXT, type TEXT, owner TEXT, created_by TEXT,
+    private_ip TEXT, public_ip TEXT, updated_at REAL, PRIMARY KEY (scope, region, id));
+CREATE TABLE IF NOT EXISTS buckets (
+    scope TEXT, name TEXT, owner TEXT, created_by TEXT, updated_at REAL, PRIMARY KEY (scope, name));
+CREATE TABLE IF NOT EXISTS zones (
+    scope TEXT, id TEXT, name TEXT, owner TEXT, created_by TEXT, record_count INTEGER,
+    updated_at REAL, PRIMARY KEY (scope, id));
+CREATE TABLE IF NOT EXISTS refreshes (
+    scope TEXT, kind TEXT, region TEXT, fetched_at REAL, PRIMARY KEY (scope, kind, region));
+"""
+
+
+def default_path() -> str:
+    return os.path.join(cache_dir(), "inventory.sqlite")
+
+
+@contextmanager
+def connect(path: str):
+    """Open the inventory, commit on success and always close."""
+    db = sqlite3.connect(path)
+    try:
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
+def _mark(db, scope: str, kind: str, region: str, now: float):
+    db.execute("INSERT OR REPLACE INTO refreshes VALUES (?, ?, ?, ?)", (scope, kind, region, now))
+
+
+def _refresh_instances(db, session: boto3.Session, scope: str, regions: list[str], max_workers: int, now: float):
+    # describe_instances has no "changed since", but one filtered page covers 1000
+    # instances; only rows whose state/type/addresses changed are rewritten.
+    stats = {"Seen": 0, "Changed": 0, "Removed": 0, "Errors": {}}
+    fetched: dict[str, list] = {r: [] for r in regions}
+    for item in fanout.iter_fanout([({"Region": r}, r) for r in regions],
+                                   lambda r: ec2h.iter_instances(session, r, with_tags=True), max_workers):
+        if "Error" in item:
+            stats["Errors"][item["Region"]] = item["Error"]
+            fetched.pop(item["Region"], None)
+        elif item["Region"] in fetched:
+            fetched[item["Region"]].append(item)
+    for region, items in fetched.items():
+        known = {r["id"]: tuple(r)[3:9] for r in db.execute(
+            "SELECT * FROM instances WHERE scope = ? AND region = ?", (scope, region))}
+        for i in items:
+            tags = i.get("Tags", {})
+            row = (i["State"], i["Type"], tags.get(OWNER_KEY), tags.get(CREATED_BY_KEY), i["PrivateIp"], i["PublicIp"])
+            if known.pop(i["InstanceId"], None) != row:
+                db.execute("INSERT OR REPLACE INTO instances VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (scope, region, i["InstanceId"], *row, now))
+                stats["Changed"] += 1
+        for iid in known:
+            db.execute("DELETE FROM instances WHERE scope = ? AND region = ? AND id = ?", (scope, region, iid))
+        stats["Seen"] += len(items)
+        stats["Removed"] += len(known)
+        _mark(db, scope, "ec2", region, now)
+    return stats
+
+
+def _refresh_buckets(db, session: boto3.Session, scope: str, full: bool, now: float):
+    # Tags are only fetched when new bucket names appear (or with --full), and
+    # then in one Tagging API sweep per bucket region.
+    s3 = client_for(session, "s3")
+    buckets = s3h.list_all(s3)
+    known = {r["name"] for r in db.execute("SELECT name FROM buckets WHERE scope = ?", (scope,))}
+    todo = [b for b in buckets if full or b["Name"] not in known]
+    stats = {"Seen": len(buckets), "Changed": 0, "Removed": 0, "TagSweeps": 0}
+    tags = {}
+    for region in sorted({r for r in (s3h.bucket_region(s3, b) for b in todo) if r}):
+        tags.update(tagging.tags_by_id(session, "s3", region))
+        stats["TagSweeps"] += 1
+    for b in todo:
+        t = tags.get(b["Name"], {})
+        db.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?, ?)",
+                   (scope, b["Name"], t.get(OWNER_KEY), t.get(CREATED_BY_KEY), now))
+        stats["Changed"] += 1
+    for name in known - {b["Name"] for b in buckets}:
+        db.execute("DELETE FROM buckets WHERE scope = ? AND name = ?", (scope, name))
+        stats["Removed"] += 1
+    _mark(db, scope, "s3", "global", now)
+    return stats
+
+
+def _refresh_zones(db, session: boto3.Session, scope: str, full: bool, now: float):
+    # New zones get their tags in batches of 10 via list_tags_for_resources;
+    # known zones only have their name/record count updated.
+    r53 = r53h.r53_client(session)
+    zones = [z for page in r53.get_paginator("list_hosted_zones").paginate() for z in page["HostedZones"]]
+    known = {r["id"]: (r["name"], r["record_count"]) for r in db.execute(
+        "SELECT id, name, record_count FROM zones WHERE scope = ?", (scope,))}
+    stats = {"Seen": len(zones), "Changed": 0, "Removed": 0, "TagLookups": 0}
+    new = []
+    for z in zones:
+        zid = r53h.strip_zone_id(z["Id"])
+        cur = (z["Name"], z.get("ResourceRecordSetCount"))
+        prev = known.pop(zid, None)
+        if prev is None or full:
+            new.append((zid, cur))
+        elif prev != cur:
+            db.execute("UPDATE zones SET name = ?, record_count = ?, updated_at = ? WHERE scope = ? AND id = ?",
+                       (*cur, now, scope, zid))
+            stats["Changed"] += 1
+    for i in range(0, len(new), 10):
+        chunk = dict(new[i:i + 10])
+        res = r53.list_tags_for_resources(ResourceType="hostedzone", ResourceIds=list(chunk))
+        stats["TagLookups"] += 1
+        for ts in res.get("ResourceTagSets", []):
+            zid = ts["ResourceId"]
+            tags = tags_list_to_dict(ts.get("Tags", []))
+            db.execute("INSERT OR REPLACE INTO zones VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (scope, zid, chunk[zid][0], tags.get(OWNER_KEY), tags.get(CREATED_BY_KEY), chunk[zid][1], now))
+            stats["Changed"] += 1
+    for zid in known:
+        db.execute("DELETE FROM zones WHERE scope = ? AND id = ?", (scope, zid))
+        stats["Removed"] += 1
+    _mark(db, scope, "route53", "global", now)
+    return stats
+
+
+def refresh(session: boto3.Session, path: str, scope: str, kinds=KINDS, regions: list[str] | None = None,
+            full: bool = False, max_workers: int = fanout.DEFAULT_WORKERS):
+    started = time.monotonic()
+    now = time.time()
+    out = {}
+    with connect(path) as db:
+        if "ec2" in kinds:
+            out["Instances"] = _refresh_instances(db, session, scope, regions or [session.region_name], max_workers, now)
+        if "s3" in kinds:
+            out["Buckets"] = _refresh_buckets(db, session, scope, full, now)
+        if "route53" in kinds:
+            out["Zones"] = _refresh_zones(db, session, scope, full, now)
+    out["Seconds"] = round(time.monotonic() - started, 3)
+    return out
+
+
+_QUERIES = {
+    "instances": ("ec2", "SELECT region, id, state, type, owner, private_ip, public_ip FROM instances", {"state", "type"}),
+    "buckets": ("s3", "SELECT name, owner FROM buckets", set()),
+    "zones": ("route53", "SELECT id, name, owner, record_count FROM zones", set()),
+}
+QUERY_KINDS = tuple(_QUERIES)
+
+
+def query(path: str, scope: str, kind: str, owner: str | None = None, state: str | None = None,
+          itype: str | None = None):
+    """Answer from the local database only; reports when the data was last fetched."""
+    refresh_kind, sql, allowed = _QUERIES[kind]
+    if (state and "state" not in allowed) or (itype and "type" not in allowed):
+        raise ValueError("--state/--type only apply to instances")
+    sql += " WHERE scope = ? AND created_by = ?"
+    params = [scope, CREATED_BY_VAL]
+    for col, val in (("owner", owner), ("state", state), ("type", itype)):
+        if val:
+            sql += f" AND {col} = ?"
+            params.append(val)
+    with connect(path) as db:
+        rows = [dict(r) for r in db.execute(sql + " ORDER BY 1, 2", params)]
+        fetched = db.execute("SELECT MIN(fetched_at) FROM refreshes WHERE scope = ? AND kind = ?",
+                             (scope, refresh_kind)).fetchone()[0]
+    if fetched is None:
+        raise RuntimeError(f"No {kind} in the inventory yet; run 'inventory refresh' first")
+    return {"FetchedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(fetched)),
+            "AgeSeconds": int(time.time() - fetched), "Count": len(rows), "Items": rows}
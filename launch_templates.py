@@ -0,0 +1,139 @@
+"""One CLI-tagged launch template per (os, instance type) for `ec2 create`.
+
+The template holds the AMI, instance type and CreatedBy tags, so a launch is
+RunInstances with a template id/version plus the Owner tags. The resolved AMI
+is cached for AMI_TTL and the template id/version per profile and region, so a
+repeat launch makes no image or template lookups; a new template version is
+created only when the resolved AMI changes.
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from utils import cache_dir, tags_list_to_dict, CREATED_BY_KEY, CREATED_BY_VAL
+
+AMI_TTL = 6 * 3600
+# RunInstances errors meaning the cached template (version) was deleted out of
+# band or its AMI was deregistered.
+GONE_CODES = {"InvalidLaunchTemplateId.NotFound", "InvalidLaunchTemplateId.VersionNotFound",
+              "InvalidLaunchTemplateName.NotFoundException", "InvalidAMIID.NotFound", "InvalidAMIID.Unavailable"}
+_lock = threading.Lock()
+
+
+def template_name(os_choice: str, instance_type: str) -> str:
+    return f"{CREATED_BY_VAL}-{os_choice}-{instance_type}"
+
+
+def _path(profile: str | None) -> str:
+    return os.path.join(cache_dir(), f"launch-templates-{profile or 'default'}.json")
+
+
+def _load(profile: str | None) -> dict:
+    try:
+        with open(_path(profile), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _update(profile: str | None, section: str, key: str, value: dict | None):
+    with _lock:
+        state = _load(profile)
+        if value is None:
+            state.get(section, {}).pop(key, None)
+        else:
+            state.setdefault(section, {})[key] = value
+        path = _path(profile)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, path)
+
+
+def resolve_ami(profile: str | None, region: str, os_choice: str, lookup) -> str:
+    """lookup() -> AMI id, cached per region and OS for AMI_TTL."""
+    key = f"{region}/{os_choice}"
+    hit = _load(profile).get("amis", {}).get(key)
+    if hit and time.time() - hit["At"] < AMI_TTL:
+        return hit["ImageId"]
+    ami = lookup()
+    _update(profile, "amis", key, {"ImageId": ami, "At": time.time()})
+    return ami
+
+
+def _cli_tag() -> list[dict]:
+    return [{"Key": CREATED_BY_KEY, "Value": CREATED_BY_VAL}]
+
+
+def _find(ec2, name: str) -> dict | None:
+    try:
+        lts = ec2.describe_launch_templates(LaunchTemplateNames=[name])["LaunchTemplates"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "InvalidLaunchTemplateName.NotFoundException":
+            return None
+        raise
+    return lts[0] if lts else None
+
+
+def _create(ec2, name: str, ami: str, instance_type: str) -> dict | None:
+    data = {"ImageId": ami, "InstanceType": instance_type,
+            "TagSpecifications": [{"ResourceType": "instance", "Tags": _cli_tag()},
+                                  {"ResourceType": "volume", "Tags": _cli_tag()}]}
+    try:
+        lt = ec2.create_launch_template(LaunchTemplateName=name, LaunchTemplateData=data, VersionDescription=ami,
+                                        TagSpecifications=[{"ResourceType": "launch-template", "Tags": _cli_tag()}])
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "InvalidLaunchTemplateName.AlreadyExistsException":
+            return None  # a concurrent run created it first
+        raise
+    lt = lt["LaunchTemplate"]
+    return {"LaunchTemplateId": lt["LaunchTemplateId"], "LaunchTemplateName": name,
+            "Version": lt["LatestVersionNumber"], "ImageId": ami}
+
+
+def _refresh(ec2, lt: dict, ami: str) -> dict:
+    """The template's latest version if it already uses `ami`, else a new default version that does."""
+    if tags_list_to_dict(lt.get("Tags", [])).get(CREATED_BY_KEY) != CREATED_BY_VAL:
+        raise PermissionError(f"Launch template {lt['LaunchTemplateName']} exists but was not created by this CLI")
+    lt_id = lt["LaunchTemplateId"]
+    latest = ec2.describe_launch_template_versions(LaunchTemplateId=lt_id, Versions=["$Latest"])["LaunchTemplateVersions"][0]
+    version = latest["VersionNumber"]
+    if latest["LaunchTemplateData"].get("ImageId") != ami:
+        version = ec2.create_launch_template_version(
+            LaunchTemplateId=lt_id, SourceVersion=str(version), LaunchTemplateData={"ImageId": ami},
+            VersionDescription=ami)["LaunchTemplateVersion"]["VersionNumber"]
+        ec2.modify_launch_template(LaunchTemplateId=lt_id, DefaultVersion=str(version))
+    return {"LaunchTemplateId": lt_id, "LaunchTemplateName": lt["LaunchTemplateName"], "Version": version, "ImageId": ami}
+
+
+def ensure(ec2, profile: str | None, os_choice: str, instance_type: str, lookup_ami) -> dict:
+    """Launch template id/name/version (and its ImageId) for (os, type), with
+    the AMI from lookup_ami() (cached); creates or re-versions it as needed.
+    Call it under the cap lock, which serializes template changes across runs."""
+    region = ec2.meta.region_name
+    ami = resolve_ami(profile, region, os_choice, lookup_ami)
+    key = f"{region}/{os_choice}/{instance_type}"
+    cached = _load(profile).get("templates", {}).get(key)
+    if cached and cached["ImageId"] == ami:
+        return cached
+    name = template_name(os_choice, instance_type)
+    for _ in range(3):  # a create or delete outside the lock can race each step
+        lt = _find(ec2, name)
+        tpl = _refresh(ec2, lt, ami) if lt else _create(ec2, name, ami, instance_type)
+        if tpl is not None:
+            break
+    else:
+        raise RuntimeError(f"Launch template {name} is being created and deleted concurrently; try again")
+    _update(profile, "templates", key, tpl)
+    return tpl
+
+
+def forget(ec2, profile: str | None, os_choice: str, instance_type: str):
+    """Drop the cached template and AMI of (os, type), e.g. after one was deleted."""
+    region = ec2.meta.region_name
+    _update(profile, "templates", f"{region}/{os_choice}/{instance_type}", None)
+    _update(profile, "amis", f"{region}/{os_choice}", None)
@@ -1,27 +1,108 @@
 from __future__ import annotations
-import argparse, sys, json
-import boto3
+import time
+_PROCESS_STARTED = time.perf_counter()
+import sys
+if __name__ == "__main__":
+    if any(a.startswith("--stats") for a in sys.argv[1:]):
+        # --stats always runs here; trace memory now so its peak includes the imports.
+        import tracemalloc
+        tracemalloc.start()
+    # Fast path: hand the command to a running daemon before importing boto3.
+    import daemon
+    _code = daemon.forward(sys.argv[1:])
+    if _code is not None:
+        sys.exit(_code)
+import argparse, json, textwrap
+import jmespath
 from botocore.exceptions import BotoCoreError, ClientError
 
-from utils import get_common_tags
+from utils import get_common_tags, configure_clients, pool_size, restored_client_settings
+import throttle
 import ec2_handler as ec2h
-import s3_handler as s3h
 import route53_handler as r53h
+import fanout
+import concurrency
+import inventory
+import tagging
+import stats
+import tracing
+import client
+import credential_cache
+import daemon
+import result_cache
+from client import MaromClient, make_session
+_IMPORTED = time.perf_counter()
 
-def make_session(profile: str | None, region: str | None):
-    if profile:
-        return boto3.Session(profile_name=profile, region_name=region)
-    return boto3.Session(region_name=region)
+def __getattr__(name: str):
+    # `from maromtool import aio` without importing asyncio on every CLI run.
+    if name == "aio":
+        import aio
+        return aio
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def print_result(ok: bool, payload: dict | list | str):
-    print(json.dumps({"ok": ok, "result": payload}, indent=2, ensure_ascii=False))
+def _csv(value: str) -> list[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
 
-def main(argv=None):
-    argv = argv if argv is not None else sys.argv[1:]
+# Compiled --query of the running command; applied to each list item (or to a
+# whole non-list result), and items it maps to null are left out. A failed
+# fan-out target's {"Region"/"Account", "Error"} item passes through as is, so
+# a projection never hides that part of the sweep is missing.
+_query = None
+
+def _select(items):
+    for item in items:
+        if isinstance(item, dict) and "Error" in item:
+            yield item
+            continue
+        item = _query.search(item)
+        if item is not None:
+            yield item
+
+def print_result(ok: bool, payload: dict | list | str, file=None, extra: dict | None = None):
+    if ok and _query is not None:
+        payload = list(_select(payload)) if isinstance(payload, list) else _query.search(payload)
+    with stats.phase("output"):
+        print(json.dumps({"ok": ok, "result": payload, **(extra or {})}, indent=2, ensure_ascii=False),
+              file=file or sys.stdout)
+
+def print_stream(items, file=None, trailer=None):
+    """Like print_result(True, list(items)) but writes each item as soon as it arrives.
+
+    `trailer` is called once the items are exhausted; its dict is merged into the envelope.
+    """
+    out = file or sys.stdout
+    if _query is not None:
+        items = _select(items)
+    out.write('{\n  "ok": true,\n  "result": [')
+    first = True
+    for item in items:
+        with stats.phase("output"):
+            out.write(("\n" if first else ",\n") + textwrap.indent(json.dumps(item, indent=2, ensure_ascii=False), "    "))
+            out.flush()
+        first = False
+    out.write("]" if first else "\n  ]")
+    for k, v in (trailer() if trailer else {}).items():
+        out.write(f",\n  {json.dumps(k)}: " + textwrap.indent(json.dumps(v, indent=2, ensure_ascii=False), "  ").lstrip())
+    out.write("\n}\n")
+    out.flush()
+
+def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(prog="platform-cli", description="AWS CLI helper for EC2/S3/Route53 with enforced rules and tagging.")
     p.add_argument("--profile", help="AWS profile to use (credentials via roles/profiles)")
     p.add_argument("--region", help="AWS region (overrides default profile region)")
     p.add_argument("--owner", help="Owner tag value (default: current OS user)")
+    p.add_argument("--regions", help="List commands: 'all' or comma-separated regions to sweep in parallel")
+    p.add_argument("--profiles", help="List commands: 'all-from-config' or comma-separated profiles to sweep in parallel")
+    p.add_argument("--max-workers", type=int, default=fanout.DEFAULT_WORKERS, help="Parallel workers for --regions/--profiles; also sizes connection pools (default: 16)")
+    p.add_argument("--max-attempts", type=int, help="Max attempts per API call, adaptive retry mode (default: 8)")
+    p.add_argument("--connect-timeout", type=float, help="Connect timeout in seconds (default: 5)")
+    p.add_argument("--read-timeout", type=float, help="Read timeout in seconds (default: 30)")
+    p.add_argument("--rate-limits", help="Client-side limits, e.g. 'ec2:read=20/100,route53=5/5' or 'off' (default: $MAROMTOOL_RATE_LIMITS)")
+    p.add_argument("--stats", action="store_true", help="Print timing, API call and memory statistics to stderr at exit")
+    p.add_argument("--stats-file", help="Also write the statistics as JSON to this file")
+    p.add_argument("--trace", metavar="OUT_JSON", help="Write a Chrome trace-event timeline (Perfetto / chrome://tracing)")
+    p.add_argument("--query", help="JMESPath expression applied to each listed item (or to the whole result), e.g. '{id: InstanceId, state: State}'")
+    p.add_argument("--max-age", type=float, metavar="SECONDS", help="List commands: answer from the local result cache when it is at most this old")
 
     sp = p.add_subparsers(dest="resource", required=True)
 
@@ -32,6 +113,8 @@ def main(argv=None):
     ec2_create = ec2_sp.add_parser("create", help="Create instance (types: t3.micro | t2.small; cap: 2 running)")
     ec2_create.add_argument("--type", required=True, choices=sorted(ec2h.EC2_ALLOWED_TYPES))
     ec2_create.add_argument("--os", default="ubuntu", choices=["ubuntu", "amazon-linux"], help="Base AMI OS (default: ubuntu)")
+    ec2_create.add_argument("--client-token", help="Idempotency token; re-running with the token of an earlier launch returns that instance")
+    ec2_create.add_argument("--lock", help="Cap lock backend: 'file' or 'dynamodb:TABLE' (default: $MAROMTOOL_CAP_LOCK or file)")
 
     ec2_start = ec2_sp.add_parser("start", help="Start an instance created by this CLI")
     ec2_start.add_argument("--id", required=True, help="EC2 instance-id")
@@ -68,6 +151,9 @@ def main(argv=None):
 
     rec_list = r53_sp.add_parser("list-records", help="List records in a CLI-created zone")
     rec_list.add_argument("--zone-id", required=True)
+    rec_list.add_argument("--name", help="Only records with this name (seeks instead of scanning the zone)")
+    rec_list.add_argument("--type", choices=["A","AAAA","CNAME","TXT","MX","SRV","NS","SOA","PTR"], help="Only records of this type (requires --name)")
+    rec_list.add_argument("--prefix", action="store_true", help="With --name, also match every name below it")
 
     rec_upsert = r53_sp.add_parser("upsert-record", help="Create/Update a DNS record in a CLI-created zone")
     rec_upsert.add_argument("--zone-id", required=True)
@@ -82,59 +168,277 @@ def main(argv=None):
     rec_delete.add_argument("--type", required=True, choices=["A","AAAA","CNAME","TXT","MX","SRV","NS","SOA","PTR"])
     rec_delete.add_argument("--values", required=True, help="Comma-separated values")
 
+    z_export = r53_sp.add_parser("export", help="Stream a CLI-created zone as a zone file")
+    z_export.add_argument("--zone-id", required=True)
+    z_export.add_argument("--format", default="bind", choices=["bind"], help="Output format (default: bind)")
+    z_export.add_argument("--out", default="-", help="Output file (default: stdout; summary goes to stderr)")
+
+    z_import = r53_sp.add_parser("import", help="UPSERT the records of a BIND zone file into a CLI-created zone")
+    z_import.add_argument("--zone-id", required=True)
+    z_import.add_argument("zone_file", help="Zone file path ('-' for stdin)")
+    z_import.add_argument("--origin", help="Initial $ORIGIN (default: the zone name)")
+    z_import.add_argument("--batch-size", type=int, default=r53h.BATCH_MAX_UPSERTS, help="Max records per change batch")
+
+    z_snap = r53_sp.add_parser("snapshot", help="Fetch all CLI-created zones into a local indexed snapshot")
+    z_snap.add_argument("--workers", type=int, default=8, help="Max zones fetched in parallel; adapts below it (default: 8)")
+
+    z_query = r53_sp.add_parser("query", help="Query the local zone snapshot (no AWS calls)")
+    z_query.add_argument("--name", help="Record name")
+    z_query.add_argument("--suffix", action="store_true", help="With --name, also match every name below it")
+    z_query.add_argument("--value", help="Record value (e.g. a CNAME target)")
+    z_query.add_argument("--ip", help="IP address or CIDR block (reverse lookup of A/AAAA values)")
+    z_query.add_argument("--type", choices=["A","AAAA","CNAME","TXT","MX","SRV","NS","SOA","PTR"])
+
+    z_verify = r53_sp.add_parser("verify", help="Wait until every authoritative nameserver serves a record's values")
+    z_verify.add_argument("--zone-id", required=True)
+    z_verify.add_argument("--name", required=True)
+    z_verify.add_argument("--type", default="A", choices=["A","AAAA","CNAME","TXT","MX","SRV","NS","PTR"])
+    z_verify.add_argument("--values", help="Comma-separated expected values (default: current Route53 values)")
+    z_verify.add_argument("--timeout", type=float, default=120.0, help="Give up after this many seconds (default: 120)")
+    z_verify.add_argument("--nameserver", action="append", help="host[:port] to query instead of the zone's NS set (repeatable)")
+
+    # Discovery
+    disc = sp.add_parser("discover", help="Bulk-list CLI-created resources through the Resource Groups Tagging API")
+    disc.add_argument("--kinds", default=",".join(tagging.RESOURCE_TYPES), help="Comma-separated: ec2,s3,route53 (default: all)")
+
+    # Inventory
+    inv = sp.add_parser("inventory", help="Local SQLite inventory of CLI-created resources")
+    inv_sp = inv.add_subparsers(dest="action", required=True)
+
+    inv_refresh = inv_sp.add_parser("refresh", help="Fetch what changed into the local inventory")
+    inv_refresh.add_argument("--kinds", default=",".join(inventory.KINDS), help="Comma-separated: ec2,s3,route53 (default: all)")
+    inv_refresh.add_argument("--full", action="store_true", help="Re-read tags of already known buckets and zones")
+
+    inv_query = inv_sp.add_parser("query", help="Query the local inventory (no AWS calls)")
+    inv_query.add_argument("--kind", required=True, choices=inventory.QUERY_KINDS)
+    inv_query.add_argument("--owner")
+    inv_query.add_argument("--state", help="Instance state (instances only)")
+    inv_query.add_argument("--type", help="Instance type (instances only)")
+
+    dmn = sp.add_parser("daemon", help="Serve CLI calls from a warm local process over a Unix socket")
+    dmn.add_argument("--idle-timeout", type=float, default=daemon.IDLE_TIMEOUT, help="Exit after this many idle seconds (default: 900)")
+    dmn.add_argument("--status", action="store_true", help="Show the running daemon's status")
+    dmn.add_argument("--stop", action="store_true", help="Stop the running daemon")
+    return p
+
+def main(argv=None):
+    global _query
+    argv = argv if argv is not None else sys.argv[1:]
+    parse_started = time.perf_counter()
+    p = build_parser()
     args = p.parse_args(argv)
+    try:
+        query = jmespath.compile(args.query) if args.query else None
+    except jmespath.exceptions.JMESPathError as e:
+        p.error(f"--query: {e}")
+
+    collector = tracer = None
+    if args.trace:
+        tracer = tracing.enable(_PROCESS_STARTED)
+        tracer.add("import", "phase", _PROCESS_STARTED, _IMPORTED)
+        tracer.add("parse", "phase", parse_started, time.perf_counter())
+    if args.stats or args.stats_file:
+        collector = stats.enable(_PROCESS_STARTED)
+        collector.add_phase("import", _IMPORTED - _PROCESS_STARTED)
+        collector.add_phase("parse", time.perf_counter() - parse_started)
+    _query = query
+    try:
+        with stats.phase("command"):
+            _run(p, args)
+    finally:
+        _query = None
+        if collector is not None:
+            stats.report(collector, sys.stderr, args.stats_file)
+            stats.disable()
+        if tracer is not None:
+            tracer.save(args.trace)
+            tracing.disable()
 
-    session = make_session(args.profile, args.region)
+def _serve_request(argv: list[str]):
+    # Daemon requests share its process: restore the client settings each one sets.
+    with restored_client_settings():
+        main(argv)
+
+# Read commands --max-age can answer from the result cache, with the arguments
+# (besides profile and region) that key their entries.
+_CACHEABLE = {("ec2", "list"): ("regions",), ("s3", "list"): (), ("route53", "list-zones"): (),
+              ("route53", "list-records"): ("zone_id", "name", "type", "prefix")}
+
+def _cache_key(args, mc: MaromClient) -> dict:
+    key = {"region": mc.region, "command": f"{args.resource} {args.action}"}
+    key.update((a, getattr(args, a)) for a in _CACHEABLE[(args.resource, args.action)])
+    return key
+
+def _cached(args, mc: MaromClient, fetch):
+    """fetch() for a read command, or its cached result under --max-age.
+    Returns (result, extra envelope keys noting a cache hit)."""
+    if args.max_age is None:
+        return fetch(), {}
+    key = _cache_key(args, mc)
+    hit = result_cache.get(mc.scope, args.resource, key, args.max_age)
+    if hit is not None:
+        return hit[0], {"cached": {"AgeSeconds": round(hit[1], 1), "MaxAge": args.max_age}}
+    started = time.time()
+    result = fetch()
+    result_cache.put(mc.scope, args.resource, key, started, result)
+    return result, {}
+
+def _cached_stream(args, mc: MaromClient, make_iter, trailer):
+    """print_stream() counterpart of _cached(); a sweep with failed regions is not stored."""
+    if args.max_age is None:
+        return print_stream(make_iter(), trailer=trailer)
+    key = _cache_key(args, mc)
+    hit = result_cache.get(mc.scope, args.resource, key, args.max_age)
+    if hit is not None:
+        return print_stream(hit[0], trailer=lambda: {"cached": {"AgeSeconds": round(hit[1], 1), "MaxAge": args.max_age}})
+    started, items = time.time(), []
+
+    def tee():
+        for item in make_iter():
+            items.append(item)
+            yield item
+        if not any("Error" in i for i in items):
+            result_cache.put(mc.scope, args.resource, key, started, items)
+    print_stream(tee(), trailer=trailer)
+
+def _run(p: argparse.ArgumentParser, args):
+    try:
+        # Size each client's connection pool to the threads that may share it.
+        workers = max(args.max_workers, getattr(args, "workers", 0) or 0)
+        configure_clients(max_attempts=args.max_attempts, connect_timeout=args.connect_timeout,
+                          read_timeout=args.read_timeout, max_pool_connections=pool_size(workers))
+        throttle.configure(args.rate_limits)
+    except ValueError as e:
+        p.error(str(e))
+    command = (args.resource, getattr(args, "action", None))
+    if args.max_age is not None:
+        if args.max_age < 0:
+            p.error("--max-age must be >= 0")
+        if args.profiles or command not in _CACHEABLE:
+            p.error("--max-age applies to: ec2 list, s3 list, route53 list-zones, route53 list-records")
+
+    if args.resource == "daemon":
+        if args.status or args.stop:
+            res = daemon.control("stop" if args.stop else "status")
+            print_result(res is not None, res or {"error": f"No daemon listening on {daemon.socket_path()}"})
+            sys.exit(0 if res is not None else 1)
+        client.keep_sessions()
+        refresher = credential_cache.refresh_in_background(client.cached_sessions)
+        try:
+            daemon.Daemon(daemon.socket_path(), _serve_request, args.idle_timeout).serve_forever()
+        except (RuntimeError, OSError) as e:
+            print_result(False, {"error": str(e)})
+            sys.exit(2)
+        finally:
+            refresher.set()
+        return
+
+    if args.profiles:
+        if args.profile:
+            p.error("--profile and --profiles are mutually exclusive")
+        fanned = {("ec2", "list"): (lambda s, r: MaromClient(session=s).iter_instances(r), False),
+                  ("s3", "list"): (lambda s, r: MaromClient(session=s).list_buckets(), True),
+                  ("route53", "list-zones"): (lambda s, r: MaromClient(session=s).list_zones(), True)}
+        if (args.resource, args.action) not in fanned:
+            p.error("--profiles applies to: ec2 list, s3 list, route53 list-zones")
+        fn, global_service = fanned[(args.resource, args.action)]
+        try:
+            profiles = fanout.resolve_profiles(args.profiles)
+        except ValueError as e:
+            print_result(False, {"error": str(e)})
+            sys.exit(2)
+        limiter = concurrency.AdaptiveLimiter(args.max_workers)
+        print_stream(fanout.iter_account_fanout(make_session, profiles, fn, args.region, args.regions,
+                                                global_service, limiter=limiter),
+                     trailer=lambda: {"concurrency": limiter.report()})
+        return
+
+    with stats.phase("credentials"):
+        mc = MaromClient(args.profile, args.region, args.owner, args.max_workers)
+        if stats.active():
+            mc.session.get_credentials()
 
     try:
         if args.resource == "ec2":
             if args.action == "create":
-                res = ec2h.create_instance(session, args.type, args.os, args.owner)
-                print_result(True, res)
+                print_result(True, mc.create_instance(args.type, args.os, args.client_token, args.lock))
             elif args.action == "start":
-                res = ec2h.start_instance(session, args.id)
-                print_result(True, res)
+                print_result(True, mc.start_instance(args.id))
             elif args.action == "stop":
-                res = ec2h.stop_instance(session, args.id)
-                print_result(True, res)
+                print_result(True, mc.stop_instance(args.id))
             elif args.action == "list":
-                res = ec2h.list_instances(session)
-                print_result(True, res)
+                if args.regions:
+                    limiter = concurrency.AdaptiveLimiter(args.max_workers)
+                    _cached_stream(args, mc, lambda: mc.iter_instances_in_regions(args.regions, limiter),
+                                   trailer=lambda: {"concurrency": limiter.report()})
+                else:
+                    res, extra = _cached(args, mc, mc.list_instances)
+                    print_result(True, res, extra=extra)
 
         elif args.resource == "s3":
             if args.action == "create":
-                res = s3h.create_bucket(session, args.name, args.region, args.public, args.confirm, args.owner)
-                print_result(True, res)
+                print_result(True, mc.create_bucket(args.name, args.public, args.confirm))
             elif args.action == "upload":
-                res = s3h.upload_file(session, args.region, args.bucket, args.key, args.file_path)
-                print_result(True, res)
+                print_result(True, mc.upload_file(args.bucket, args.key, args.file_path))
             elif args.action == "list":
-                res = s3h.list_buckets(session)
-                print_result(True, res)
+                res, extra = _cached(args, mc, mc.list_buckets)
+                print_result(True, res, extra=extra)
 
         elif args.resource == "route53":
             if args.action == "create-zone":
-                res = r53h.create_zone(session, args.name, args.owner)
-                print_result(True, res)
+                print_result(True, mc.create_zone(args.name))
             elif args.action == "list-zones":
-                res = r53h.list_zones(session)
-                print_result(True, res)
+                res, extra = _cached(args, mc, mc.list_zones)
+                print_result(True, res, extra=extra)
             elif args.action == "list-records":
-                res = r53h.list_records(session, args.zone_id)
-                print_result(True, res)
+                res, extra = _cached(args, mc, lambda: mc.list_records(args.zone_id, args.name, args.type, args.prefix))
+                print_result(True, res, extra=extra)
             elif args.action == "upsert-record":
-                values = [v.strip() for v in args.values.split(",") if v.strip()]
-                res = r53h.upsert_record(session, args.zone_id, args.name, args.type, args.ttl, values)
-                print_result(True, res)
+                print_result(True, mc.upsert_record(args.zone_id, args.name, args.type, args.ttl, _csv(args.values)))
             elif args.action == "delete-record":
-                values = [v.strip() for v in args.values.split(",") if v.strip()]
-                res = r53h.delete_record(session, args.zone_id, args.name, args.type, values)
+                print_result(True, mc.delete_record(args.zone_id, args.name, args.type, _csv(args.values)))
+            elif args.action == "export":
+                if args.out == "-":
+                    res = mc.export_zone(args.zone_id, sys.stdout)
+                    print_result(True, res, file=sys.stderr)
+                else:
+                    with open(args.out, "w", encoding="utf-8") as fh:
+                        res = mc.export_zone(args.zone_id, fh)
+                    print_result(True, res)
+            elif args.action == "import":
+                if args.zone_file == "-":
+                    res = mc.import_zone(args.zone_id, sys.stdin, args.origin, args.batch_size)
+                else:
+                    with open(args.zone_file, encoding="utf-8") as fh:
+                        res = mc.import_zone(args.zone_id, fh, args.origin, args.batch_size)
                 print_result(True, res)
+            elif args.action == "snapshot":
+                print_result(True, mc.snapshot(args.workers))
+            elif args.action == "query":
+                print_result(True, mc.query_snapshot(name=args.name, suffix=args.suffix, value=args.value,
+                                                     ip=args.ip, rtype=args.type))
+            elif args.action == "verify":
+                values = _csv(args.values) if args.values else None
+                res = mc.verify(args.zone_id, args.name, args.type, values, args.timeout, args.nameserver)
+                print_result(res["Converged"], res)
+                if not res["Converged"]:
+                    sys.exit(1)
+
+        elif args.resource == "discover":
+            regions = mc.regions(args.regions) if args.regions else None
+            print_stream(mc.discover(_csv(args.kinds), regions))
+
+        elif args.resource == "inventory":
+            if args.action == "refresh":
+                regions = mc.regions(args.regions) if args.regions else None
+                print_result(True, mc.refresh_inventory(_csv(args.kinds), regions, args.full))
+            elif args.action == "query":
+                print_result(True, mc.query_inventory(args.kind, args.owner, args.state, args.type))
 
     except (ClientError, BotoCoreError) as e:
         print_result(False, {"error": str(e)})
         sys.exit(2)
-    except (ValueError, PermissionError, RuntimeError) as e:
+    except (ValueError, PermissionError, RuntimeError, OSError) as e:
         print_result(False, {"error": str(e)})
         sys.exit(2)
 
@@ -0,0 +1,93 @@
+"""On-disk cache of the botocore data files the tool loads on every run.
+
+botocore parses the service models (ec2's service-2.json alone is ~3 MB of
+JSON), endpoint rulesets and endpoints.json from the installed package each
+time a process builds its first client. CachingLoader keeps a marshal copy of
+each file it loads for the services below, with extras already merged, in a
+directory keyed by the botocore and Python versions and by the model search
+paths, so upgrading botocore or dropping a model into ~/.aws/models starts a
+fresh cache. Any unreadable entry is reloaded from botocore.
+"""
+from __future__ import annotations
+import hashlib
+import marshal
+import os
+import sys
+import threading
+
+import botocore
+from botocore.loaders import Loader
+
+from utils import cache_dir
+
+CACHED_SERVICES = frozenset({"ec2", "s3", "route53", "sts", "resourcegroupstaggingapi"})
+CACHED_DATA = frozenset({"endpoints", "partitions"})
+
+# Shared by every session's loader: sessions come and go (per profile, per
+# daemon request), the parsed models do not change within a process.
+_memo: dict[str, object] = {}
+_memo_lock = threading.Lock()
+
+
+def _plain(obj):
+    # The JSON loader builds OrderedDicts, which marshal cannot store; plain
+    # dicts keep the same order and botocore only iterates them.
+    if isinstance(obj, dict):
+        return {k: _plain(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_plain(v) for v in obj]
+    return obj
+
+
+class CachingLoader(Loader):
+    def _cache_path(self, name: str) -> str:
+        stamps = []
+        for p in self.search_paths:
+            try:
+                stamps.append((p, os.stat(p).st_mtime_ns))
+            except OSError:
+                pass
+        key = repr((botocore.__version__, sys.version_info[:2], stamps)).encode()
+        tag = f"botocore-{botocore.__version__}-{hashlib.sha1(key).hexdigest()[:12]}"
+        return os.path.join(cache_dir("models", tag), f"{name}.marshal")
+
+    def _cached(self, name: str, load):
+        path = self._cache_path(name)
+        with _memo_lock:
+            if path in _memo:
+                return _memo[path]
+        try:
+            with open(path, "rb") as fh:
+                data = marshal.load(fh)
+        except (OSError, EOFError, ValueError, TypeError):
+            data = _plain(load())
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "wb") as fh:
+                    marshal.dump(data, fh)
+                os.replace(tmp, path)
+            except OSError:
+                pass  # read-only cache dir: still serve from memory
+        with _memo_lock:
+            return _memo.setdefault(path, data)
+
+    def load_service_model(self, service_name, type_name, api_version=None):
+        load = super().load_service_model
+        if service_name not in CACHED_SERVICES:
+            return load(service_name, type_name, api_version)
+        name = f"{service_name}.{api_version or 'latest'}.{type_name}"
+        return self._cached(name, lambda: load(service_name, type_name, api_version))
+
+    def load_data_with_path(self, name):
+        load = super().load_data_with_path
+        if name not in CACHED_DATA:
+            return load(name)
+        return tuple(self._cached(name, lambda: list(load(name))))
+
+
+def create_loader(search_path_string: str | None = None) -> CachingLoader:
+    """Same as botocore.loaders.create_loader, for the session's data_path setting."""
+    if search_path_string is None:
+        return CachingLoader()
+    paths = [os.path.expanduser(os.path.expandvars(p)) for p in search_path_string.split(os.pathsep)]
+    return CachingLoader(extra_search_paths=paths)
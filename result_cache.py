@@ -0,0 +1,87 @@
+"""Opt-in on-disk cache of read-command results (`--max-age`).
+
+Entries are marshal + zlib files under <cache dir>/results/<scope>/, one per
+(service, key), where the key holds the region, command and its arguments.
+Every mutation through MaromClient (so the CLI, the daemon and aio alike)
+bumps its service's invalidation time in that scope, and an entry only counts
+if its read started after the last invalidation, so a listing that raced a
+create/stop is never served afterwards.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import marshal
+import os
+import threading
+import time
+import zlib
+
+from utils import cache_dir
+
+CACHE_VERSION = 1
+log = logging.getLogger(__name__)
+
+
+def _dir(scope: str) -> str:
+    return cache_dir("results", scope)
+
+
+def _path(scope: str, service: str, key: dict) -> str:
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:20]
+    return os.path.join(_dir(scope), f"{service}-{digest}.marshal.z")
+
+
+def _invalidated_at(scope: str, service: str) -> float:
+    try:
+        with open(os.path.join(_dir(scope), f"{service}.invalidated"), encoding="utf-8") as fh:
+            return float(fh.read())
+    except (OSError, ValueError):
+        return 0.0
+
+
+def _write(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def get(scope: str, service: str, key: dict, max_age: float):
+    """(result, age in seconds) of a valid entry at most `max_age` old, else None."""
+    try:
+        with open(_path(scope, service, key), "rb") as fh:
+            entry = marshal.loads(zlib.decompress(fh.read()))
+    except (OSError, EOFError, ValueError, TypeError, zlib.error):
+        return None
+    if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION or entry.get("key") != key:
+        return None
+    age = time.time() - entry["started"]
+    if age > max_age or entry["started"] <= _invalidated_at(scope, service):
+        return None
+    return entry["result"], age
+
+
+def put(scope: str, service: str, key: dict, started: float, result):
+    """Store `result` of a read that started at `started` (time.time())."""
+    entry = {"version": CACHE_VERSION, "key": key, "started": started, "result": result}
+    try:
+        _write(_path(scope, service, key), zlib.compress(marshal.dumps(entry)))
+    except (OSError, ValueError):
+        pass  # unwritable cache dir or unmarshallable result: just don't cache
+
+
+def invalidate(scope: str, service: str):
+    """Forget every cached result of `service` in `scope`. Errors are logged, not
+    raised, so they never replace the outcome of the mutation that called this."""
+    try:
+        d = _dir(scope)
+        _write(os.path.join(d, f"{service}.invalidated"), repr(time.time()).encode())
+        for entry in os.scandir(d):
+            if entry.name.startswith(f"{service}-"):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+    except OSError as e:
+        log.warning("Could not invalidate cached %s results for %s: %s", service, scope, e)
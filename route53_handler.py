@@ -1,19 +1,29 @@
 from __future__ import annotations
+import time
 import boto3
 from botocore.exceptions import ClientError
 from uuid import uuid4
-from utils import get_common_tags, tags_list_to_dict, CREATED_BY_KEY, CREATED_BY_VAL
+from utils import get_common_tags, tags_list_to_dict, client_for, CREATED_BY_KEY, CREATED_BY_VAL
+import tagging
+import zonefile
 
-def _r53_client(session: boto3.Session):
-    return session.client("route53")
+# Route53 ChangeBatch limits: 1000 ResourceRecord elements and 32000 characters of values.
+BATCH_MAX_RECORDS = 1000
+BATCH_MAX_CHARS = 32000
+# Each UPSERT counts twice against both limits (a DELETE plus a CREATE).
+BATCH_MAX_UPSERTS = BATCH_MAX_RECORDS // 2
+BATCH_MAX_UPSERT_CHARS = BATCH_MAX_CHARS // 2
 
-def _strip_zone_id(zid: str) -> str:
+def r53_client(session: boto3.Session):
+    return client_for(session, "route53")
+
+def strip_zone_id(zid: str) -> str:
     return zid.split("/")[-1]
 
 def create_zone(session: boto3.Session, name: str, owner: str | None):
-    r53 = _r53_client(session)
+    r53 = r53_client(session)
     hz = r53.create_hosted_zone(Name=name, CallerReference=str(uuid4()))["HostedZone"]
-    zid = _strip_zone_id(hz["Id"])
+    zid = strip_zone_id(hz["Id"])
     r53.change_tags_for_resource(
         ResourceType="hostedzone",
         ResourceId=zid,
@@ -21,8 +31,8 @@ def create_zone(session: boto3.Session, name: str, owner: str | None):
     )
     return {"Id": zid, "Name": hz["Name"]}
 
-def _ensure_cli_zone(r53, hosted_zone_id: str):
-    zid = _strip_zone_id(hosted_zone_id)
+def ensure_cli_zone(r53, hosted_zone_id: str):
+    zid = strip_zone_id(hosted_zone_id)
     tags = r53.list_tags_for_resource(ResourceType="hostedzone", ResourceId=zid)["ResourceTagSet"]["Tags"]
     t = tags_list_to_dict(tags)
     if t.get(CREATED_BY_KEY) != CREATED_BY_VAL:
@@ -30,34 +40,179 @@ def _ensure_cli_zone(r53, hosted_zone_id: str):
     return zid
 
 def list_zones(session: boto3.Session):
-    r53 = _r53_client(session)
-    zones = r53.list_hosted_zones()["HostedZones"]
+    # CLI zone ids come from one Tagging API sweep instead of a tag call per zone.
+    r53 = r53_client(session)
+    cli_zones = tagging.tags_by_id(session, "route53", tagging.GLOBAL_REGION)
     out = []
-    for z in zones:
-        zid = _strip_zone_id(z["Id"])
-        tags = r53.list_tags_for_resource(ResourceType="hostedzone", ResourceId=zid)["ResourceTagSet"]["Tags"]
-        if tags_list_to_dict(tags).get(CREATED_BY_KEY) == CREATED_BY_VAL:
-            out.append({"Id": zid, "Name": z["Name"]})
+    if not cli_zones:
+        return out
+    for page in r53.get_paginator("list_hosted_zones").paginate():
+        for z in page["HostedZones"]:
+            zid = strip_zone_id(z["Id"])
+            if zid in cli_zones:
+                out.append({"Id": zid, "Name": z["Name"]})
     return out
 
-def list_records(session: boto3.Session, hosted_zone_id: str):
-    r53 = _r53_client(session)
-    zid = _ensure_cli_zone(r53, hosted_zone_id)
-    out = []
+def get_nameservers(session: boto3.Session, hosted_zone_id: str) -> list[str]:
+    r53 = r53_client(session)
+    zid = ensure_cli_zone(r53, hosted_zone_id)
+    return r53.get_hosted_zone(Id=zid).get("DelegationSet", {}).get("NameServers", [])
+
+def iter_record_sets(r53, zid: str, start_name: str | None = None, start_type: str | None = None):
+    kwargs = {"HostedZoneId": zid}
+    if start_name:
+        kwargs["StartRecordName"] = start_name
+        if start_type:
+            kwargs["StartRecordType"] = start_type
     paginator = r53.get_paginator("list_resource_record_sets")
-    for page in paginator.paginate(HostedZoneId=zid):
-        for rr in page.get("ResourceRecordSets", []):
-            out.append({
-                "Name": rr.get("Name"),
-                "Type": rr.get("Type"),
-                "TTL": rr.get("TTL"),
-                "Values": [v.get("Value") for v in rr.get("ResourceRecords", [])] if rr.get("ResourceRecords") else rr.get("AliasTarget"),
-            })
+    for page in paginator.paginate(**kwargs):
+        yield from page.get("ResourceRecordSets", [])
+
+def normalize_name(name: str) -> str:
+    """Lower-case, fully-qualified, with '*' escaped the way Route53 returns it."""
+    name = name.lower().replace("*", "\\052")
+    return name if name.endswith(".") else name + "."
+
+def label_key(name: str) -> tuple:
+    # Route53 lists record sets in reverse-label order (com, example, www).
+    return tuple(reversed(name.rstrip(".").split(".")))
+
+def _seek_record_sets(r53, zid: str, name: str, rtype: str | None, prefix: bool):
+    """Start listing at `name` and stop as soon as the results move past it.
+
+    With `prefix`, `name` and every name below it match; they are contiguous in
+    Route53's ordering, so the listing still stops at the first non-match.
+    """
+    target = normalize_name(name)
+    tkey = label_key(target)
+    for rr in iter_record_sets(r53, zid, target, None if prefix else rtype):
+        rname = rr["Name"].lower()
+        if prefix:
+            if label_key(rname)[:len(tkey)] != tkey:
+                return
+        elif rname != target or (rtype and rr["Type"] != rtype):
+            return
+        if rtype and rr["Type"] != rtype:
+            continue
+        yield rr
+
+def list_records(session: boto3.Session, hosted_zone_id: str, name: str | None = None,
+                 rtype: str | None = None, prefix: bool = False):
+    if rtype and not name:
+        raise ValueError("--type requires --name")
+    r53 = r53_client(session)
+    zid = ensure_cli_zone(r53, hosted_zone_id)
+    out = []
+    rrsets = _seek_record_sets(r53, zid, name, rtype, prefix) if name else iter_record_sets(r53, zid)
+    for rr in rrsets:
+        out.append({
+            "Name": rr.get("Name"),
+            "Type": rr.get("Type"),
+            "TTL": rr.get("TTL"),
+            "Values": [v.get("Value") for v in rr.get("ResourceRecords", [])] if rr.get("ResourceRecords") else rr.get("AliasTarget"),
+        })
     return out
 
+def _rate(count: int, started: float) -> dict:
+    elapsed = time.monotonic() - started
+    return {"Seconds": round(elapsed, 3), "RecordsPerSecond": round(count / elapsed, 1) if elapsed > 0 else None}
+
+def export_zone(session: boto3.Session, hosted_zone_id: str, out):
+    """Stream a zone into BIND zone-file text, one paginator page at a time."""
+    r53 = r53_client(session)
+    zid = ensure_cli_zone(r53, hosted_zone_id)
+    started = time.monotonic()
+    apex = r53.get_hosted_zone(Id=zid)["HostedZone"]["Name"]
+    out.write(f"$ORIGIN {zonefile.bind_name(apex)}\n")
+    records = rrsets = skipped = 0
+    for rr in iter_record_sets(r53, zid):
+        lines = zonefile.format_rrset(rr)
+        if rr.get("ResourceRecords") and not rr.get("SetIdentifier"):
+            records += len(lines)
+            rrsets += 1
+        else:
+            skipped += 1
+        out.write("\n".join(lines) + "\n")
+    out.flush()
+    return {"HostedZoneId": zid, "Records": records, "RRSets": rrsets, "Skipped": skipped, **_rate(records, started)}
+
+def import_zone(session: boto3.Session, hosted_zone_id: str, lines, origin: str | None = None,
+                batch_size: int = BATCH_MAX_UPSERTS):
+    """UPSERT the records of a zone file in chunked change batches.
+
+    Consecutive records are grouped into RRSets; only the pending batch, the
+    RRSet being read and the keys already submitted are held in memory, so an
+    RRSet split across distant parts of the file is rejected rather than
+    silently overwritten. An RRSet never straddles two batches: when it does
+    not fit, the pending batch is sent first.
+    The zone's own SOA and apex NS records are left to Route53.
+    """
+    if not 1 <= batch_size <= BATCH_MAX_UPSERTS:
+        raise ValueError(f"batch_size must be between 1 and {BATCH_MAX_UPSERTS}")
+    r53 = r53_client(session)
+    zid = ensure_cli_zone(r53, hosted_zone_id)
+    started = time.monotonic()
+    apex = r53.get_hosted_zone(Id=zid)["HostedZone"]["Name"].lower()
+
+    pending: dict[tuple, dict] = {}
+    flushed: set[tuple] = set()
+    stats = {"Records": 0, "RRSets": 0, "Batches": 0, "Skipped": 0, "ChangeId": None}
+    size = chars = 0
+    key, rrset, rr_chars = None, None, 0
+
+    def flush():
+        nonlocal size, chars
+        if not pending:
+            return
+        res = r53.change_resource_record_sets(
+            HostedZoneId=zid,
+            ChangeBatch={"Changes": [{"Action": "UPSERT", "ResourceRecordSet": rr} for rr in pending.values()]},
+        )
+        stats["Batches"] += 1
+        stats["RRSets"] += len(pending)
+        stats["ChangeId"] = strip_zone_id(res["ChangeInfo"]["Id"])
+        flushed.update(pending)
+        pending.clear()
+        size = chars = 0
+
+    def place():
+        nonlocal size, chars
+        n = len(rrset["ResourceRecords"])
+        if n > batch_size or rr_chars > BATCH_MAX_UPSERT_CHARS:
+            raise ValueError(f"RRSet {rrset['Name']} {rrset['Type']} does not fit in one change batch")
+        if size + n > batch_size or chars + rr_chars > BATCH_MAX_UPSERT_CHARS:
+            flush()
+        pending[key] = rrset
+        size += n
+        chars += rr_chars
+
+    for rec in zonefile.parse_zone(lines, origin=origin or apex):
+        name = rec["Name"].lower()
+        if rec["Type"] == "SOA" or (rec["Type"] == "NS" and name == apex):
+            stats["Skipped"] += 1
+            continue
+        if (name, rec["Type"]) != key:
+            if rrset is not None:
+                place()
+            key = (name, rec["Type"])
+            if key in flushed or key in pending:
+                raise ValueError(f"Records for {rec['Name']} {rec['Type']} are not contiguous in the zone file")
+            rrset = {"Name": rec["Name"], "Type": rec["Type"], "TTL": rec["TTL"], "ResourceRecords": []}
+            rr_chars = 0
+        elif rec["TTL"] != rrset["TTL"]:
+            raise ValueError(f"Records for {rec['Name']} {rec['Type']} have different TTLs "
+                             f"({rrset['TTL']} and {rec['TTL']}); Route53 keeps one TTL per RRSet")
+        rrset["ResourceRecords"].append({"Value": rec["Value"]})
+        rr_chars += len(rec["Value"])
+        stats["Records"] += 1
+    if rrset is not None:
+        place()
+    flush()
+    return {"HostedZoneId": zid, **stats, **_rate(stats["Records"], started)}
+
 def upsert_record(session: boto3.Session, hosted_zone_id: str, name: str, rtype: str, ttl: int, values: list[str]):
-    r53 = _r53_client(session)
-    zid = _ensure_cli_zone(r53, hosted_zone_id)
+    r53 = r53_client(session)
+    zid = ensure_cli_zone(r53, hosted_zone_id)
     r53.change_resource_record_sets(
         HostedZoneId=zid,
         ChangeBatch={
@@ -73,8 +228,8 @@ def upsert_record(session: boto3.Session, hosted_zone_id: str, name: str, rtype:
     return {"HostedZoneId": zid, "Action": "UPSERT", "Name": name, "Type": rtype}
 
 def delete_record(session: boto3.Session, hosted_zone_id: str, name: str, rtype: str, values: list[str]):
-    r53 = _r53_client(session)
-    zid = _ensure_cli_zone(r53, hosted_zone_id)
+    r53 = r53_client(session)
+    zid = ensure_cli_zone(r53, hosted_zone_id)
     r53.change_resource_record_sets(
         HostedZoneId=zid,
         ChangeBatch={
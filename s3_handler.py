@@ -1,60 +1,70 @@
+from __future__ import annotations
 import boto3
-import json
-from utils import get_common_tags
+from botocore.exceptions import ClientError
+import tagging
+from utils import get_common_tags, tags_list_to_dict, client_for, CREATED_BY_KEY, CREATED_BY_VAL
 
-def get_s3_client(profile=None, region=None):
-    session = boto3.Session(profile_name=profile, region_name=region)
-    return session.client("s3")
+LIST_PAGE_SIZE = 10000  # ListBuckets' MaxBuckets ceiling
 
-def create_bucket(bucket_name, public=False, owner=None, profile=None, region=None):
-    s3 = get_s3_client(profile, region)
-    tags = get_common_tags(owner)
+def _s3_client(session: boto3.Session, region: str | None = None):
+    return client_for(session, "s3", region)
 
-    create_params = {"Bucket": bucket_name}
+def _ensure_cli_bucket(s3, bucket_name: str):
+    try:
+        tags = tags_list_to_dict(s3.get_bucket_tagging(Bucket=bucket_name)["TagSet"])
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchTagSet":
+            raise
+        tags = {}
+    if tags.get(CREATED_BY_KEY) != CREATED_BY_VAL:
+        raise PermissionError("Bucket is not managed by platform-cli")
 
+def create_bucket(session: boto3.Session, bucket_name: str, region: str | None, public: bool,
+                  confirm: str | None, owner: str | None):
+    if public and confirm != "yes":
+        raise ValueError("Public bucket requires --confirm yes")
+    region = region or session.region_name
+    s3 = _s3_client(session, region)
+    create_params = {"Bucket": bucket_name}
     if region and region != "us-east-1":
         create_params["CreateBucketConfiguration"] = {"LocationConstraint": region}
 
-    try:
-        s3.create_bucket(**create_params)
+    s3.create_bucket(**create_params)
+    s3.put_bucket_tagging(Bucket=bucket_name, Tagging={"TagSet": get_common_tags(owner)})
+    if public:
+        s3.put_bucket_acl(Bucket=bucket_name, ACL="public-read")
+    return {"Bucket": bucket_name, "Region": region or "us-east-1", "Public": public}
 
-        s3.put_bucket_tagging(
-            Bucket=bucket_name,
-            Tagging={"TagSet": tags}
-        )
+def upload_file(session: boto3.Session, region: str | None, bucket_name: str, key: str, file_path: str):
+    s3 = _s3_client(session, region)
+    _ensure_cli_bucket(s3, bucket_name)
+    s3.upload_file(file_path, bucket_name, key)
+    return {"Bucket": bucket_name, "Key": key, "File": file_path}
 
-        if public:
-            s3.put_bucket_acl(Bucket=bucket_name, ACL="public-read")
+def list_all(s3) -> list[dict]:
+    """Every bucket of the account. S3 includes BucketRegion only when the request
+    has a parameter, so the pages are requested with MaxBuckets."""
+    pages = s3.get_paginator("list_buckets").paginate(PaginationConfig={"PageSize": LIST_PAGE_SIZE})
+    return [b for page in pages for b in page.get("Buckets", [])]
 
-        print(f" Created bucket {bucket_name} in {region or 'default region'}")
-
-    except Exception as e:
-        print(json.dumps({"ok": False, "result": {"error": str(e)}}, indent=2))
-
-def upload_file(bucket_name, file_path, profile=None, region=None):
-    s3 = get_s3_client(profile, region)
+def bucket_region(s3, bucket: dict) -> str | None:
+    # Some endpoints and partitions still omit BucketRegion; ask the bucket then.
+    if bucket.get("BucketRegion"):
+        return bucket["BucketRegion"]
     try:
-        s3.upload_file(file_path, bucket_name, file_path.split("/")[-1])
-        print(f" Uploaded {file_path} to {bucket_name}")
-    except Exception as e:
-        print(json.dumps({"ok": False, "result": {"error": str(e)}}, indent=2))
+        loc = s3.get_bucket_location(Bucket=bucket["Name"])["LocationConstraint"]
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "NoSuchBucket":
+            return None  # deleted since it was listed
+        raise
+    return {None: "us-east-1", "": "us-east-1", "EU": "eu-west-1"}.get(loc, loc)
 
-def list_buckets(profile=None, region=None):
-    s3 = get_s3_client(profile, region)
-    try:
-        resp = s3.list_buckets()
-        buckets = []
-        for b in resp.get("Buckets", []):
-            tags = []
-            try:
-                tagset = s3.get_bucket_tagging(Bucket=b["Name"])["TagSet"]
-                tags = {t["Key"]: t["Value"] for t in tagset}
-            except:
-                continue
-
-            if tags.get("CreatedBy") == "platform-cli":
-                buckets.append({"Name": b["Name"], "Tags": tags})
-
-        print(json.dumps(buckets, indent=2))
-    except Exception as e:
-        print(json.dumps({"ok": False, "result": {"error": str(e)}}, indent=2))
+def list_buckets(session: boto3.Session):
+    # One Tagging API sweep per bucket region instead of get_bucket_tagging per bucket.
+    s3 = _s3_client(session)
+    buckets = list_all(s3)
+    regions = {r for r in (bucket_region(s3, b) for b in buckets) if r}
+    tags = {}
+    for region in sorted(regions):
+        tags.update(tagging.tags_by_id(session, "s3", region))
+    return [{"Name": b["Name"], "Tags": tags[b["Name"]]} for b in buckets if b["Name"] in tags]
@@ -0,0 +1,224 @@
+from __future__ import annotations
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import tracing
+
+_active: "Stats | None" = None
+_conn_log: "_ConnectionLog | None" = None
+URLLIB3_LOGGER = "urllib3.connectionpool"
+
+
+def _pct(sorted_vals: list[float], q: float) -> float:
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+def _int_header(headers, name: str) -> int:
+    try:
+        return int(headers.get(name) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Stats:
+    """Wall time per phase and per-operation API call metrics for one run.
+
+    Phases may nest (command includes output); API latency is measured from
+    parameter build to response, so it includes retries and their backoff.
+    Retries are counted from botocore's needs-retry event as each attempt
+    ends, so calls that finally fail count theirs too.
+    """
+
+    def __init__(self, process_started: float):
+        self.process_started = process_started
+        self.phases: dict[str, float] = {}
+        self.calls: dict[str, list[float]] = {}
+        self.retries: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.requests = 0
+        self.connections: dict[str, int] = {"new": 0, "discarded": 0}
+        self.memory_since = "start"  # or "enable": tracemalloc missed the imports
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started)
+
+    def add_phase(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    # botocore event handlers
+    def _start(self, model=None, context=None, **kwargs):
+        if context is not None:
+            context["stats_started"] = time.perf_counter()
+            context["stats_op"] = self._op(model)
+
+    def _sent(self, request=None, **kwargs):
+        if request is not None:
+            n = _int_header(request.headers, "Content-Length")
+            with self._lock:
+                self.bytes_sent += n
+                self.requests += 1
+
+    def count_connection(self, kind: str):
+        with self._lock:
+            self.connections[kind] += 1
+
+    def _attempted(self, attempts: int = 1, operation=None, **kwargs):
+        # needs-retry fires after every attempt; any attempt past the first was a retry.
+        if attempts > 1:
+            op = self._op(operation)
+            with self._lock:
+                self.retries[op] = self.retries.get(op, 0) + 1
+
+    def _finish(self, context: dict | None, received: int = 0, error: bool = False):
+        context = context or {}
+        started = context.get("stats_started")
+        latency = time.perf_counter() - started if started else 0.0
+        op = context.get("stats_op", "unknown")
+        with self._lock:
+            self.calls.setdefault(op, []).append(latency)
+            self.bytes_received += received
+            if error:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+    def _after_call(self, http_response=None, context=None, **kwargs):
+        received = _int_header(http_response.headers, "content-length") if http_response is not None else 0
+        self._finish(context, received, error=http_response is not None and http_response.status_code >= 300)
+
+    def _after_call_error(self, context=None, **kwargs):
+        self._finish(context, error=True)
+
+    def _op(self, model) -> str:
+        return f"{model.service_model.service_name}.{model.name}" if model is not None else "unknown"
+
+    def install(self, client):
+        ev = client.meta.events
+        ev.register_first("before-parameter-build", self._start)
+        ev.register("before-send", self._sent)
+        ev.register_last("needs-retry", self._attempted)
+        ev.register_last("after-call", self._after_call)
+        ev.register_last("after-call-error", self._after_call_error)
+
+    def summary(self) -> dict:
+        wall = time.perf_counter() - self.process_started
+        with self._lock:
+            ops = {}
+            for op, lats in sorted(self.calls.items()):
+                s = sorted(lats)
+                ops[op] = {"calls": len(s), "p50_ms": round(_pct(s, 0.5) * 1000, 2),
+                           "p95_ms": round(_pct(s, 0.95) * 1000, 2), "max_ms": round(s[-1] * 1000, 2),
+                           "retries": self.retries.get(op, 0), "errors": self.errors.get(op, 0)}
+            out = {"wall_seconds": round(wall, 4),
+                   "phases": {k: round(v, 4) for k, v in self.phases.items()},
+                   "api_calls": sum(o["calls"] for o in ops.values()),
+                   "retries": sum(o["retries"] for o in ops.values()),
+                   "errors": sum(o["errors"] for o in ops.values()),
+                   "bytes_sent": self.bytes_sent, "bytes_received": self.bytes_received,
+                   # Every HTTP attempt either opened a connection or reused a pooled one.
+                   "connections": {"new": self.connections["new"],
+                                   "reused": max(0, self.requests - self.connections["new"]),
+                                   "discarded": self.connections["discarded"]},
+                   "operations": ops}
+        if tracemalloc.is_tracing():
+            out["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            out["peak_memory_since"] = self.memory_since
+        return out
+
+
+def format_summary(s: dict) -> str:
+    lines = [f"maromtool stats: wall {s['wall_seconds']:.3f}s"
+             + (f"  peak mem {s['peak_memory_bytes'] / 1048576:.1f} MiB"
+                + (" (after imports)" if s.get("peak_memory_since") == "enable" else "")
+                if "peak_memory_bytes" in s else ""),
+             "phases: " + "  ".join(f"{k} {v:.3f}s" for k, v in s["phases"].items()),
+             f"api calls: {s['api_calls']} (retries {s['retries']}, errors {s['errors']})"
+             f"  sent {s['bytes_sent']} B  received {s['bytes_received']} B",
+             "connections: new {new}, reused {reused}, discarded (pool full) {discarded}".format(**s["connections"])]
+    if s["operations"]:
+        width = max(len(op) for op in s["operations"])
+        lines.append(f"{'operation':<{width}}  {'calls':>6}  {'p50 ms':>8}  {'p95 ms':>8}  {'max ms':>8}  {'retries':>7}")
+        for op, o in s["operations"].items():
+            lines.append(f"{op:<{width}}  {o['calls']:>6}  {o['p50_ms']:>8.1f}  {o['p95_ms']:>8.1f}  {o['max_ms']:>8.1f}  {o['retries']:>7}")
+    return "\n".join(lines)
+
+
+class _ConnectionLog(logging.Handler):
+    """Counts urllib3's "Starting new HTTPS connection" and "Connection pool is
+    full" messages; the pools keep no counters of their own."""
+
+    def __init__(self, collector: Stats):
+        super().__init__(logging.DEBUG)
+        self.collector = collector
+        self.previous_level = logging.NOTSET
+
+    def emit(self, record: logging.LogRecord):
+        msg = str(record.msg)
+        if msg.startswith("Starting new"):
+            self.collector.count_connection("new")
+        elif msg.startswith("Connection pool is full"):
+            self.collector.count_connection("discarded")
+
+
+def enable(process_started: float, trace_memory: bool = True) -> Stats:
+    """Start collecting; clients created afterwards are instrumented by install().
+    The memory peak covers the imports only if tracemalloc was started before them."""
+    global _active, _conn_log
+    _active = Stats(process_started)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _active.memory_since = "enable"
+    logger = logging.getLogger(URLLIB3_LOGGER)
+    _conn_log = _ConnectionLog(_active)
+    _conn_log.previous_level = logger.level
+    logger.addHandler(_conn_log)
+    logger.setLevel(logging.DEBUG)
+    return _active
+
+
+def active() -> "Stats | None":
+    return _active
+
+
+def disable():
+    global _active, _conn_log
+    if _conn_log is not None:
+        logger = logging.getLogger(URLLIB3_LOGGER)
+        logger.removeHandler(_conn_log)
+        logger.setLevel(_conn_log.previous_level)
+    _active = _conn_log = None
+
+
+def install(client):
+    if _active is not None:
+        _active.install(client)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a phase when stats are enabled and record it as a --trace span."""
+    with tracing.span(name):
+        if _active is None:
+            yield
+        else:
+            with _active.phase(name):
+                yield
+
+
+def report(collector: Stats, stream, path: str | None = None):
+    summary = collector.summary()
+    print(format_summary(summary), file=stream)
+    if path:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(summary, fh, indent=2)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+import boto3
+from utils import client_for, tags_list_to_dict, CREATED_BY_KEY, CREATED_BY_VAL
+
+# Resource Groups Tagging API resource-type filters per CLI resource kind.
+RESOURCE_TYPES = {"ec2": "ec2:instance", "s3": "s3", "route53": "route53:hostedzone"}
+GLOBAL_REGION = "us-east-1"  # Route53 resources are listed from us-east-1
+
+
+def iter_tagged_resources(session: boto3.Session, resource_types: list[str], region: str | None = None):
+    """Yield {"ARN", "Tags"} for every CreatedBy=platform-cli resource, 100 per page."""
+    client = client_for(session, "resourcegroupstaggingapi", region)
+    paginator = client.get_paginator("get_resources")
+    for page in paginator.paginate(TagFilters=[{"Key": CREATED_BY_KEY, "Values": [CREATED_BY_VAL]}],
+                                   ResourceTypeFilters=resource_types, ResourcesPerPage=100):
+        for m in page.get("ResourceTagMappingList", []):
+            yield {"ARN": m["ResourceARN"], "Tags": tags_list_to_dict(m.get("Tags", []))}
+
+
+def arn_resource_id(arn: str) -> str:
+    """'arn:aws:s3:::bucket' -> 'bucket', 'arn:aws:route53:::hostedzone/Z1' -> 'Z1'."""
+    return arn.split(":", 5)[5].split("/")[-1]
+
+
+def tags_by_id(session: boto3.Session, kind: str, region: str | None = None) -> dict[str, dict]:
+    return {arn_resource_id(r["ARN"]): r["Tags"]
+            for r in iter_tagged_resources(session, [RESOURCE_TYPES[kind]], region)}
+
+
+def discover(session: boto3.Session, kinds: list[str], regions: list[str] | None = None):
+    """Bulk discovery of CLI-created resources; Route53 is global, EC2/S3 per region."""
+    regional = [RESOURCE_TYPES[k] for k in kinds if k != "route53"]
+    if regional:
+        for region in regions or [session.region_name]:
+            for r in iter_tagged_resources(session, regional, region):
+                yield {"Region": region, **r}
+    if "route53" in kinds:
+        for r in iter_tagged_resources(session, [RESOURCE_TYPES["route53"]], GLOBAL_REGION):
+            yield {"Region": "global", **r}
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# The tool's modules live at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake(monkeypatch, tmp_path):
+    """A FakeAWS backend behind every client, with fake credentials and a private cache dir."""
+    from benchmarks.budgets import FAKE_ENV
+    from benchmarks.fake_aws import FakeAWS
+    for k, v in FAKE_ENV.items():
+        if v is None:
+            monkeypatch.delenv(k, raising=False)
+        else:
+            monkeypatch.setenv(k, v)
+    monkeypatch.setenv("MAROMTOOL_CACHE_DIR", str(tmp_path / "cache"))
+    f = FakeAWS()
+    with f.installed():
+        yield f
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+import aio
+import client
+
+
+def test_calls_run_on_the_loop_executor_with_their_keyword_arguments(fake, monkeypatch):
+    threads = []
+    create = client.MaromClient.create_instance
+
+    def recording(self, *args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return create(self, *args, **kwargs)
+
+    monkeypatch.setattr(client.MaromClient, "create_instance", recording)
+
+    async def main():
+        try:
+            first = await aio.create_instance("t3.micro", client_token="tok-1", lock="file")
+            again = await aio.create_instance("t3.micro", client_token="tok-1", lock="file")
+            return first, again
+        finally:
+            await aio.shutdown()
+
+    first, again = asyncio.run(main())
+    assert first["ClientToken"] == again["ClientToken"] == "tok-1"
+    assert again["Replayed"] and again["InstanceId"] == first["InstanceId"]
+    assert fake.calls["ec2.RunInstances"] == 1
+    assert len(threads) == 2 and all(t.startswith("maromtool-aio") for t in threads)
+
+
+def test_bulk_helpers_return_each_result_or_error(fake):
+    ids = fake.seed_instances(2, state="stopped")
+
+    async def main():
+        try:
+            return await aio.start_instances(ids + ["i-missing"], timeout=30)
+        finally:
+            await aio.shutdown()
+
+    results = asyncio.run(main())
+    assert [r["InstanceId"] for r in results[:2]] == ids
+    assert isinstance(results[2], Exception)
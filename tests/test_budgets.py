@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from benchmarks import budgets
+
+CASES = [(name, n) for name, b in budgets.BUDGETS.items() for n in b["sizes"]]
+
+
+@pytest.mark.parametrize("name,n", CASES, ids=[f"{name}-{n}" for name, n in CASES])
+def test_budget(name, n):
+    before = dict(os.environ)
+    r = budgets.check(name, n)
+    assert not r["problems"], f"{name} N={n}: {'; '.join(r['problems'])} {r['operations']}"
+    assert dict(os.environ) == before
@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import cap_lock
+import client
+import ec2_handler as ec2h
+import utils
+from benchmarks.fake_aws import ACCOUNT
+
+
+def _create_concurrently(fake, lock: str, n: int = 6) -> list:
+    fake.latency = 0.01  # let the racers overlap
+    mc = client.MaromClient(max_workers=n)
+
+    def create(_):
+        try:
+            return mc.create_instance("t3.micro", lock=lock)
+        except RuntimeError as e:
+            return e
+
+    with ThreadPoolExecutor(n) as pool:
+        return list(pool.map(create, range(n)))
+
+
+@pytest.mark.parametrize("lock", ["file", "dynamodb:locks"])
+def test_concurrent_creates_respect_the_cap(fake, lock):
+    fake.seed_table("locks")
+    results = _create_concurrently(fake, lock)
+    launched = [r for r in results if isinstance(r, dict)]
+    refused = [r for r in results if isinstance(r, RuntimeError)]
+    assert len(launched) == ec2h.EC2_CAP == fake.calls["ec2.RunInstances"]
+    assert len(refused) == len(results) - ec2h.EC2_CAP
+    assert all("Hard cap reached" in str(e) for e in refused)
+
+
+def test_lock_is_named_by_account_and_region(fake, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "_accounts", {})
+    fake.seed_table("locks")
+    mc = client.MaromClient()
+    mc.create_instance("t3.micro", lock="dynamodb:locks")
+    mc.create_instance("t3.micro", lock="file")
+    name = f"ec2-cap-{ACCOUNT}-us-east-1"
+    assert [dict(key)["LockName"] for key in fake.tables["locks"]] == [name]
+    assert os.path.exists(os.path.join(tmp_path, "cache", "locks", f"{name}.lock"))
+    assert fake.calls["sts.GetCallerIdentity"] == 1  # remembered per access key
+
+
+class _BrokenRelease:
+    def acquire(self, timeout):
+        return {}
+
+    def release(self, state):
+        raise RuntimeError("lease lost")
+
+
+def test_release_error_does_not_mask_the_block_error(caplog):
+    with pytest.raises(ValueError, match="from the block"):
+        with cap_lock.held(_BrokenRelease()):
+            raise ValueError("from the block")
+    assert "lease lost" in caplog.text
+
+
+def test_release_error_surfaces_after_a_clean_block():
+    with pytest.raises(RuntimeError, match="lease lost"):
+        with cap_lock.held(_BrokenRelease()):
+            pass
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+import change_queue
+import client
+
+
+@pytest.fixture
+def zone(fake):
+    zid = fake.seed_zones(1)[0]
+    return zid, fake.zones[zid]["name"]
+
+
+def coalescer(**kw):
+    return change_queue.ChangeCoalescer(client.MaromClient().session, **kw)
+
+
+def served(fake, zid, name, rtype="A"):
+    rr = fake.zones[zid]["records"].get(fake._record_key(name, rtype))
+    return [r["Value"] for r in rr["ResourceRecords"]] if rr else None
+
+
+def test_changes_within_the_window_share_one_batch(fake, zone):
+    zid, apex = zone
+    with coalescer(window=0.2) as q:
+        futs = [q.upsert(zid, f"a.{apex}", "A", 60, ["10.0.0.1"]),
+                q.upsert(zid, f"b.{apex}", "A", 60, ["10.0.0.2"]),
+                q.upsert(zid, f"a.{apex}", "A", 60, ["10.0.0.3"])]
+    results = [f.result() for f in futs]
+    assert fake.calls["route53.ChangeResourceRecordSets"] == 1
+    assert len({r["ChangeId"] for r in results}) == 1 and results[0]["Coalesced"] == 3
+    assert served(fake, zid, f"a.{apex}") == ["10.0.0.3"]  # last write wins
+
+
+def test_record_element_limit_splits_batches(fake, zone):
+    zid, apex = zone
+    with coalescer(window=5) as q:  # only the size limit and close() flush
+        futs = [q.upsert(zid, f"h{i}.{apex}", "A", 60, ["10.0.0.1"]) for i in range(501)]
+    assert fake.calls["route53.ChangeResourceRecordSets"] == 2  # an UPSERT record counts twice
+    assert [f.result()["Coalesced"] for f in (futs[0], futs[-1])] == [500, 1]
+
+
+def test_value_character_limit_splits_batches(fake, zone):
+    zid, apex = zone
+    with coalescer(window=5) as q:
+        futs = [q.upsert(zid, f"t{i}.{apex}", "TXT", 60, ['"' + "x" * 5998 + '"']) for i in range(3)]
+    assert [f.result()["Coalesced"] for f in futs] == [2, 2, 1]
+
+
+def test_oversized_change_is_rejected_up_front(fake, zone):
+    zid, apex = zone
+    with coalescer() as q, pytest.raises(ValueError, match="exceeds the ChangeBatch limit"):
+        q.upsert(zid, f"t.{apex}", "TXT", 60, ['"' + "x" * 250 + '"'] * 70)
+
+
+def test_invalid_change_fails_only_its_caller(fake, zone):
+    zid, apex = zone
+    fake.seed_records(zid, 1)
+    taken = f"host0000000.{apex}"
+    with coalescer(window=0.2) as q:
+        good = [q.upsert(zid, f"ok{i}.{apex}", "A", 60, ["10.0.0.1"]) for i in range(6)]
+        bad = q.submit(zid, "CREATE", {"Name": taken, "Type": "A", "TTL": 60,
+                                       "ResourceRecords": [{"Value": "10.9.9.9"}]})
+    assert "already exists" in str(bad.exception())
+    assert all(f.exception() is None for f in good)
+    assert all(served(fake, zid, f"ok{i}.{apex}") == ["10.0.0.1"] for i in range(6))
+    assert served(fake, zid, taken) == ["10.0.0.0"]
+
+
+def test_one_batch_in_flight_per_zone(fake, zone, monkeypatch):
+    zid, apex = zone
+    state = {"now": 0, "max": 0}
+    lock = threading.Lock()
+    respond = fake._respond
+
+    def tracked(model=None, **kwargs):
+        if model.name != "ChangeResourceRecordSets":
+            return respond(model=model, **kwargs)
+        with lock:
+            state["now"] += 1
+            state["max"] = max(state["max"], state["now"])
+        try:
+            time.sleep(0.01)  # keep the call in flight long enough to overlap
+            return respond(model=model, **kwargs)
+        finally:
+            with lock:
+                state["now"] -= 1
+
+    monkeypatch.setattr(fake, "_respond", tracked)  # clients made from here on use it
+    with coalescer(window=0) as q:
+        def writer(w):
+            for i in range(20):
+                q.upsert(zid, f"w.{apex}", "A", 60, [f"10.0.{w}.{i}"])
+        threads = [threading.Thread(target=writer, args=(w,)) for w in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        last = q.upsert(zid, f"w.{apex}", "A", 60, ["10.9.9.9"])
+    assert last.result()
+    assert fake.calls["route53.ChangeResourceRecordSets"] > 1
+    assert state["max"] == 1
+    assert served(fake, zid, f"w.{apex}") == ["10.9.9.9"]
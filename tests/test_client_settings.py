@@ -0,0 +1,26 @@
+import maromtool
+import utils
+
+
+def test_client_for_keys_clients_by_their_settings(fake, monkeypatch):
+    monkeypatch.setattr(utils, "CLIENT_SETTINGS", dict(utils.CLIENT_SETTINGS))
+    session = fake.session()
+    default = utils.client_for(session, "ec2")
+    assert utils.client_for(session, "ec2") is default
+    utils.configure_clients(max_attempts=2)
+    short = utils.client_for(session, "ec2")
+    assert short is not default and short.meta.config.retries["total_max_attempts"] == 2
+    utils.configure_clients(max_attempts=default.meta.config.retries["total_max_attempts"])
+    assert utils.client_for(session, "ec2") is default
+
+
+def test_daemon_requests_do_not_leak_client_settings(fake, monkeypatch, capsys):
+    monkeypatch.setattr(utils, "CLIENT_SETTINGS", dict(utils.CLIENT_SETTINGS))
+    before = dict(utils.CLIENT_SETTINGS)
+    maromtool._serve_request(["--max-attempts", "2", "--read-timeout", "3", "--max-workers", "64", "ec2", "list"])
+    assert utils.CLIENT_SETTINGS == before
+    maromtool._serve_request(["ec2", "list"])
+    capsys.readouterr()
+    ec2 = utils.client_for(fake.session(), "ec2")
+    assert ec2.meta.config.retries["total_max_attempts"] == before["max_attempts"]
+    assert ec2.meta.config.read_timeout == before["read_timeout"]
@@ -0,0 +1,78 @@
+import pytest
+from botocore.exceptions import ClientError
+
+import concurrency
+import ec2_handler as ec2h
+import fanout
+
+
+def _throttle():
+    raise ClientError({"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "DescribeInstances")
+
+
+def _complete(limiter, n, **outcome):
+    for _ in range(n):
+        limiter.acquire()
+        limiter.release(0.0, **outcome)
+
+
+def test_starts_low_and_grows_to_ceiling():
+    limiter = concurrency.AdaptiveLimiter(ceiling=20)
+    assert limiter.limit == concurrency.INITIAL
+    _complete(limiter, 3)
+    assert limiter.limit == concurrency.INITIAL + 3  # +1 per completion until the first cut
+    _complete(limiter, 50)
+    assert limiter.limit == limiter.peak == 20
+
+
+def test_throttle_halves_then_grows_additively():
+    limiter = concurrency.AdaptiveLimiter(ceiling=20, initial=16)
+    with pytest.raises(ClientError):
+        limiter.run(_throttle)
+    assert (limiter.limit, limiter.throttles, limiter.decreases) == (8, 1, 1)
+    _complete(limiter, 8)  # about one round of tasks adds 1
+    assert 8.9 < limiter.limit < 9.1
+
+
+def test_slow_calls_cut_like_throttles():
+    limiter = concurrency.AdaptiveLimiter(ceiling=20, initial=10)
+    _complete(limiter, 1, slow=True)
+    assert (limiter.limit, limiter.slow, limiter.throttles) == (5, 1, 0)
+
+
+def test_one_cut_per_average_task_duration():
+    limiter = concurrency.AdaptiveLimiter(ceiling=64, initial=64)
+    limiter.acquire()
+    limiter.release(60.0)  # average task takes a minute
+    _complete(limiter, 3, throttled=True)
+    assert (limiter.limit, limiter.decreases, limiter.throttles) == (32, 1, 3)
+
+
+def test_floor_and_ceiling_bound_the_limit():
+    limiter = concurrency.AdaptiveLimiter(ceiling=4, initial=100, floor=2)
+    assert limiter.limit == 4
+    _complete(limiter, 10, throttled=True)
+    assert limiter.limit == 2
+    assert concurrency.AdaptiveLimiter(ceiling=3, initial=0, floor=9).limit == 3
+    with pytest.raises(ValueError):
+        concurrency.AdaptiveLimiter(ceiling=0)
+
+
+def test_observe_flags_rising_latency_per_operation(monkeypatch):
+    monkeypatch.setattr(concurrency, "_latency", {})
+    fast, far = ("ec2", "us-east-1", "DescribeInstances"), ("ec2", "ap-southeast-2", "DescribeInstances")
+    for _ in range(20):
+        assert not concurrency._observe(fast, 0.05)
+        assert not concurrency._observe(far, 0.3)  # slower region, same operation: not congestion
+    assert not concurrency._observe(fast, 0.2)  # one slow call is noise
+    assert any(concurrency._observe(fast, 0.5) for _ in range(5))
+
+
+def test_retried_call_in_a_task_cuts(fake):
+    fake.seed_instances(4)
+    fake.throttle_rate = 1.0
+    fake._random.random = iter([0.0] + [1.0] * 100).__next__  # only the first call is retried, once
+    limiter = concurrency.AdaptiveLimiter(ceiling=8, initial=8)
+    list(fanout.iter_fanout([({"Region": "us-east-1"}, "us-east-1")],
+                            lambda r: ec2h.iter_instances(fake.session(), r), limiter=limiter))
+    assert (limiter.throttles, limiter.decreases, limiter.limit) == (1, 1, 4)
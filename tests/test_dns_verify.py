@@ -0,0 +1,72 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+import dns_verify
+
+NAME = "www.example.com."
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(dns_verify, "BACKOFF_START", 0.05)
+    monkeypatch.setattr(dns_verify, "BACKOFF_MAX", 0.1)
+
+
+@pytest.fixture
+def stub():
+    """A StubDNSServer on its own event loop thread; yields (records, port)."""
+    records = {}
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    _, transport, port = asyncio.run_coroutine_threadsafe(dns_verify.StubDNSServer.start(records), loop).result(5)
+    yield records, port
+    loop.call_soon_threadsafe(transport.close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+def verify(port, values, timeout=2.0, rtype="A"):
+    # Explicit values and nameservers: no Route53 lookups, so no session is needed.
+    return dns_verify.verify_propagation(None, "Z1", NAME, rtype, values=values, timeout=timeout,
+                                         nameservers=[f"127.0.0.1:{port}"])
+
+
+def test_converged(stub):
+    records, port = stub
+    records[(NAME, "A")] = ["10.0.0.2", "10.0.0.1"]
+    res = verify(port, ["10.0.0.1", "10.0.0.2"])
+    assert res["Converged"] is True
+    assert res["Servers"][0]["Attempts"] == 1
+    assert sorted(res["Servers"][0]["Values"]) == ["10.0.0.1", "10.0.0.2"]
+
+
+def test_converges_after_change(stub):
+    records, port = stub
+    records[(NAME, "TXT")] = ['"old"']
+    threading.Timer(0.2, records.__setitem__, ((NAME, "TXT"), ['"new  value"'])).start()
+    res = verify(port, ['"new value"'], rtype="TXT")
+    assert res["Converged"] is True
+    assert res["Servers"][0]["Attempts"] > 1
+    assert res["ConvergenceSeconds"] >= 0.2
+
+
+def test_mismatch(stub):
+    records, port = stub
+    records[(NAME, "A")] = ["10.0.0.9"]
+    res = verify(port, ["10.0.0.1"], timeout=0.5)
+    assert res["Converged"] is False
+    assert res["ConvergenceSeconds"] is None
+    server = res["Servers"][0]
+    assert server["Values"] == ["10.0.0.9"] and server["Error"] is None
+
+
+def test_timeout():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:  # bound, never answers
+        silent.bind(("127.0.0.1", 0))
+        res = verify(silent.getsockname()[1], ["10.0.0.1"], timeout=0.5)
+    assert res["Converged"] is False
+    assert res["Servers"][0]["Error"] == "TimeoutError"
@@ -0,0 +1,27 @@
+import client
+
+
+def test_buckets_in_every_region_are_tagged(fake, tmp_path):
+    names = fake.seed_buckets(8)
+    fake.seed_buckets(2, cli=False, prefix="other")
+    regions = {fake.buckets[n]["region"] for n in names}
+    assert len(regions) > 1
+    mc = client.MaromClient()
+    path = str(tmp_path / "inventory.sqlite")
+    res = mc.refresh_inventory(["s3"], path=path)
+    assert res["Buckets"]["TagSweeps"] == len(regions)
+    assert fake.calls["s3.GetBucketLocation"] == 0
+    got = mc.query_inventory("buckets", path=path)
+    assert sorted(b["name"] for b in got["Items"]) == names
+
+
+def test_incremental_refresh_only_tags_new_buckets(fake, tmp_path):
+    fake.seed_buckets(4)
+    mc = client.MaromClient()
+    path = str(tmp_path / "inventory.sqlite")
+    mc.refresh_inventory(["s3"], path=path)
+    assert mc.refresh_inventory(["s3"], path=path)["Buckets"]["TagSweeps"] == 0
+    new = fake.seed_buckets(1, regions=["eu-central-1"])
+    res = mc.refresh_inventory(["s3"], path=path)["Buckets"]
+    assert (res["Changed"], res["TagSweeps"]) == (1, 1)
+    assert new[0] in {b["name"] for b in mc.query_inventory("buckets", path=path)["Items"]}
@@ -0,0 +1,61 @@
+import botocore
+import pytest
+from botocore.loaders import Loader
+
+import model_cache
+
+
+@pytest.fixture
+def loads(monkeypatch, tmp_path):
+    """Count what the loaders read from botocore itself, with empty caches."""
+    monkeypatch.setenv("MAROMTOOL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(model_cache, "_memo", {})
+    calls = []
+    original = Loader.load_service_model
+
+    def counting(self, service_name, type_name, api_version=None):
+        calls.append(service_name)
+        return original(self, service_name, type_name, api_version)
+
+    monkeypatch.setattr(Loader, "load_service_model", counting)
+    return calls
+
+
+def test_second_process_reads_the_marshal_copy(loads, monkeypatch):
+    first = model_cache.create_loader().load_service_model("sts", "service-2")
+    monkeypatch.setattr(model_cache, "_memo", {})  # as a new process would start
+    second = model_cache.create_loader().load_service_model("sts", "service-2")
+    assert loads == ["sts"]
+    assert second == first and second["metadata"]["serviceId"] == "STS"
+
+
+def test_same_process_serves_from_memory(loads):
+    a = model_cache.create_loader().load_service_model("sts", "service-2")
+    b = model_cache.create_loader().load_service_model("sts", "service-2")
+    assert a is b and loads == ["sts"]
+
+
+def test_new_botocore_version_misses(loads, monkeypatch):
+    model_cache.create_loader().load_service_model("sts", "service-2")
+    monkeypatch.setattr(model_cache, "_memo", {})
+    monkeypatch.setattr(botocore, "__version__", botocore.__version__ + ".post1")
+    model_cache.create_loader().load_service_model("sts", "service-2")
+    assert loads == ["sts", "sts"]
+
+
+def test_corrupt_entry_is_reloaded(loads, monkeypatch):
+    loader = model_cache.create_loader()
+    loader.load_service_model("sts", "service-2")
+    path = loader._cache_path("sts.latest.service-2")
+    with open(path, "wb") as fh:
+        fh.write(b"\x00garbage")
+    monkeypatch.setattr(model_cache, "_memo", {})
+    assert model_cache.create_loader().load_service_model("sts", "service-2")["metadata"]["serviceId"] == "STS"
+    assert loads == ["sts", "sts"]
+
+
+def test_uncached_services_go_to_botocore(loads):
+    loader = model_cache.create_loader()
+    loader.load_service_model("sqs", "service-2")
+    loader.load_service_model("sqs", "service-2")
+    assert loads == ["sqs", "sqs"]
@@ -0,0 +1,32 @@
+import json
+
+import maromtool
+from benchmarks.fake_aws import FakeError
+
+
+def _run(capsys, *argv):
+    maromtool.main(list(argv))
+    return json.loads(capsys.readouterr().out)
+
+
+def test_query_projects_items_and_drops_nulls(fake, capsys):
+    running = fake.seed_instances(2)
+    fake.seed_instances(1, state="stopped")
+    out = _run(capsys, "--query", "State=='running' && InstanceId || null", "ec2", "list")
+    assert sorted(out["result"]) == sorted(running)
+
+
+def test_failed_fanout_targets_survive_the_projection(fake, capsys, monkeypatch):
+    ids = fake.seed_instances(2, region="us-east-1")
+    describe = fake._ec2_DescribeInstances
+
+    def denied_in_eu(region, **params):
+        if region == "eu-west-1":
+            raise FakeError("UnauthorizedOperation", "not allowed here", 403)
+        return describe(region, **params)
+
+    monkeypatch.setattr(fake, "_ec2_DescribeInstances", denied_in_eu)
+    out = _run(capsys, "--query", "InstanceId", "--regions", "us-east-1,eu-west-1", "ec2", "list")
+    errors = [item for item in out["result"] if isinstance(item, dict)]
+    assert sorted(i for i in out["result"] if isinstance(i, str)) == sorted(ids)
+    assert len(errors) == 1 and errors[0]["Region"] == "eu-west-1" and "not allowed here" in errors[0]["Error"]
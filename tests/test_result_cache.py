@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import client
+import maromtool
+import result_cache
+
+
+@pytest.fixture
+def list_zones(fake, capsys):
+    """Run `route53 list-zones --max-age N`; returns (output, calls it made)."""
+    def run(max_age=60):
+        before = fake.calls["route53.ListHostedZones"]
+        maromtool.main(["--max-age", str(max_age), "route53", "list-zones"])
+        return json.loads(capsys.readouterr().out), fake.calls["route53.ListHostedZones"] - before
+    return run
+
+
+def test_repeat_is_served_from_the_cache(fake, list_zones):
+    fake.seed_zones(3)
+    first, calls = list_zones()
+    assert calls >= 1 and "cached" not in first
+    second, calls = list_zones()
+    assert calls == 0 and second["cached"]["MaxAge"] == 60
+    assert second["result"] == first["result"]
+
+
+def test_old_or_other_version_entries_miss(fake, list_zones, monkeypatch):
+    fake.seed_zones(1)
+    list_zones()
+    _, calls = list_zones(max_age=0)
+    assert calls >= 1
+    monkeypatch.setattr(result_cache, "CACHE_VERSION", result_cache.CACHE_VERSION + 1)
+    out, calls = list_zones()
+    assert calls >= 1 and "cached" not in out
+
+
+def test_mutation_through_maromclient_invalidates(fake, list_zones):
+    zid = fake.seed_zones(1)[0]
+    list_zones()
+    assert list_zones()[1] == 0
+    mc = client.MaromClient()
+    mc.upsert_record(zid, "www." + fake.zones[zid]["name"], "A", 300, ["192.0.2.1"])
+    out, calls = list_zones()
+    assert calls >= 1 and "cached" not in out
+
+
+def test_failed_mutation_still_invalidates(fake, list_zones):
+    fake.seed_zones(1)
+    list_zones()
+    with pytest.raises(Exception):
+        client.MaromClient().upsert_record("Z-MISSING", "www.example.com", "A", 300, ["192.0.2.1"])
+    assert list_zones()[1] >= 1
+
+
+def test_other_services_stay_cached(fake, list_zones):
+    fake.seed_zones(1)
+    list_zones()
+    client.MaromClient().create_bucket("cli-fresh-bucket")
+    assert list_zones()[1] == 0
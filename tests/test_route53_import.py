@@ -0,0 +1,48 @@
+import pytest
+
+import client
+import route53_handler as r53h
+
+
+@pytest.fixture
+def zone(fake):
+    return fake.seed_zones(1)[0]
+
+
+def run_import(zid, lines, **kw):
+    return r53h.import_zone(client.MaromClient().session, zid, lines, **kw)
+
+
+def batches(fake):
+    return fake.calls["route53.ChangeResourceRecordSets"]
+
+
+def test_rrset_crossing_a_batch_boundary_moves_to_the_next_batch(fake, zone):
+    lines = [f"h{i} 300 IN A 10.0.{i // 250}.{i % 250}" for i in range(499)]
+    lines += ["two 300 IN A 10.1.0.1", "two 300 IN A 10.1.0.2"]
+    res = run_import(zone, lines)
+    assert (res["Records"], res["RRSets"], res["Batches"]) == (501, 500, 2)
+
+
+def test_upsert_value_characters_count_twice(fake, zone):
+    lines = [f't{i} 300 IN TXT "{"x" * 3000}"' for i in range(12)]
+    res = run_import(zone, lines)
+    assert res["Batches"] == 3  # 5 x 3002 chars fit in 16000, 6 do not
+    assert batches(fake) == 3
+
+
+def test_rrset_too_big_for_any_batch(fake, zone):
+    with pytest.raises(ValueError, match="does not fit in one change batch"):
+        run_import(zone, [f'big 300 IN TXT "{"y" * 250}"'] * 70)
+
+
+def test_non_contiguous_rrset(fake, zone):
+    lines = ["a 300 IN A 10.0.0.1", "b 300 IN A 10.0.0.2", "a 300 IN A 10.0.0.3"]
+    with pytest.raises(ValueError, match="not contiguous"):
+        run_import(zone, lines)
+
+
+def test_records_of_one_rrset_with_different_ttls(fake, zone):
+    with pytest.raises(ValueError, match="different TTLs"):
+        run_import(zone, ["a 300 IN A 10.0.0.1", "a 60 IN A 10.0.0.2"])
+    assert batches(fake) == 0
@@ -0,0 +1,28 @@
+import client
+import s3_handler
+
+
+def test_list_buckets_in_every_region_without_location_lookups(fake):
+    names = fake.seed_buckets(8)
+    fake.seed_buckets(3, cli=False, prefix="other")
+    assert len({fake.buckets[n]["region"] for n in names}) > 1
+    got = s3_handler.list_buckets(client.MaromClient().session)
+    assert sorted(b["Name"] for b in got if b["Tags"].get("CreatedBy") == "platform-cli") == names
+    assert fake.calls["s3.GetBucketLocation"] == 0
+    assert fake.calls["s3.ListBuckets"] == 1
+
+
+def test_buckets_listed_without_region_are_located(fake, monkeypatch):
+    names = fake.seed_buckets(6)
+    list_buckets = type(fake)._s3_ListBuckets
+
+    def no_region(self, region, **params):
+        out = list_buckets(self, region, **params)
+        for b in out["Buckets"]:
+            b.pop("BucketRegion", None)
+        return out
+
+    monkeypatch.setattr(type(fake), "_s3_ListBuckets", no_region)
+    got = s3_handler.list_buckets(client.MaromClient().session)
+    assert sorted(b["Name"] for b in got) == names
+    assert fake.calls["s3.GetBucketLocation"] == 6
@@ -0,0 +1,54 @@
+import json
+import time
+import tracemalloc
+
+import pytest
+from botocore.exceptions import ClientError
+
+import maromtool
+import stats
+import utils
+
+
+@pytest.fixture
+def untraced():
+    was_tracing = tracemalloc.is_tracing()
+    yield
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def _retry_first_call(fake, times):
+    fake.throttle_rate = 1.0
+    fake._random.random = iter([0.0] * times + [1.0] * 1000).__next__
+
+
+def test_stats_file_counts_calls_and_retries(fake, tmp_path, capsys, untraced):
+    fake.seed_instances(3)
+    _retry_first_call(fake, 2)
+    path = tmp_path / "stats.json"
+    maromtool.main(["--stats-file", str(path), "ec2", "list"])
+    out = json.loads(capsys.readouterr().out)
+    assert out["ok"] and len(out["result"]) == 3
+    s = json.loads(path.read_text())
+    ops = s["operations"]
+    assert s["api_calls"] == sum(o["calls"] for o in ops.values()) == sum(fake.calls.values())
+    assert ops["ec2.DescribeInstances"]["calls"] == fake.calls["ec2.DescribeInstances"]
+    assert (s["retries"], s["errors"]) == (2, 0)
+    assert {"import", "parse", "command", "output"} <= set(s["phases"])
+    assert s["peak_memory_since"] == "enable"  # tracemalloc was not started before the imports
+
+
+def test_failed_calls_count_as_errors(fake):
+    collector = stats.enable(time.perf_counter(), trace_memory=False)
+    try:
+        s3 = utils.client_for(fake.session(), "s3")
+        with pytest.raises(ClientError):
+            s3.get_bucket_location(Bucket="no-such-bucket")
+        s3.list_buckets()
+        summary = collector.summary()
+    finally:
+        stats.disable()
+    assert summary["operations"]["s3.GetBucketLocation"]["errors"] == 1
+    assert (summary["api_calls"], summary["errors"], summary["retries"]) == (2, 1, 0)
+    assert "peak_memory_bytes" not in summary
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+import throttle
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("ec2:read=20/100", {("ec2", "read"): (20.0, 100)}),
+    ("route53=5/5", {("route53", "read"): (5.0, 5), ("route53", "write"): (5.0, 5)}),
+    ("s3:write=2.5", {("s3", "write"): (2.5, 2)}),
+    ("sts:read=0.2", {("sts", "read"): (0.2, 1)}),
+    (" ec2:write=1/3 , ,s3:read=7 ", {("ec2", "write"): (1.0, 3), ("s3", "read"): (7.0, 7)}),
+    ("", {}),
+])
+def test_parse_limits(spec, expected):
+    assert throttle.parse_limits(spec) == expected
+
+
+@pytest.mark.parametrize("spec", [
+    "ec2", "ec2:read=", "ec2:read=abc", "ec2:read=0", "ec2:read=-1/5", "ec2:read=5/0",
+    "ec2:read=5/x", "ec2:read=inf", "ec2:read=-inf", "ec2:read=nan", "ec2:read=1e400/5",
+])
+def test_parse_limits_rejects_bad_values(spec):
+    with pytest.raises(ValueError, match="Invalid rate limit"):
+        throttle.parse_limits(spec)
+
+
+def test_parse_limits_rejects_unknown_family():
+    with pytest.raises(ValueError, match="Unknown API family"):
+        throttle.parse_limits("ec2:list=5/5")
+
+
+@pytest.mark.parametrize("rate, burst", [(0, 1), (-1, 1), (1, 0), (float("inf"), 1), (float("nan"), 1)])
+def test_token_bucket_rejects_bad_limits(rate, burst):
+    with pytest.raises(ValueError):
+        throttle.TokenBucket(rate, burst)
+
+
+def test_token_bucket_allows_burst_then_waits():
+    bucket = throttle.TokenBucket(rate=50.0, burst=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    start = time.monotonic()
+    waited = bucket.acquire()
+    assert waited > 0
+    assert time.monotonic() - start >= 0.015
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = throttle.TokenBucket(rate=100.0, burst=2)
+    bucket.acquire(), bucket.acquire()
+    time.sleep(0.1)  # enough for 10 tokens, capped at 2
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() > 0
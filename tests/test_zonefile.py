@@ -0,0 +1,72 @@
+import re
+
+import pytest
+
+import zonefile
+
+ZONE = """\
+$ORIGIN example.com.
+$TTL 1h
+@   IN SOA ns1 hostmaster (
+        2024010101 ; serial
+        7200       ; refresh
+        3600 1209600 300 )
+    IN NS  ns1
+www 300 IN A 10.0.0.1
+        IN A 10.0.0.2          ; blank owner: still www
+txt     IN TXT "v=spf1; -all" "second;part"
+@       IN MX 10 mail
+mail    IN CNAME mail.example.net.
+$ORIGIN sub.example.com.
+host    60 A 10.1.0.1
+$TTL 2m
+other   A 10.1.0.2
+"""
+
+
+def parse(text, **kw):
+    return list(zonefile.parse_zone(text.splitlines(keepends=True), **kw))
+
+
+def test_zone():
+    recs = parse(ZONE)
+    assert [(r["Name"], r["Type"], r["TTL"], r["Value"]) for r in recs] == [
+        ("example.com.", "SOA", 3600, "ns1.example.com. hostmaster.example.com. 2024010101 7200 3600 1209600 300"),
+        ("example.com.", "NS", 3600, "ns1.example.com."),
+        ("www.example.com.", "A", 300, "10.0.0.1"),
+        ("www.example.com.", "A", 3600, "10.0.0.2"),
+        ("txt.example.com.", "TXT", 3600, '"v=spf1; -all" "second;part"'),
+        ("example.com.", "MX", 3600, "10 mail.example.com."),
+        ("mail.example.com.", "CNAME", 3600, "mail.example.net."),
+        ("host.sub.example.com.", "A", 60, "10.1.0.1"),
+        ("other.sub.example.com.", "A", 120, "10.1.0.2"),
+    ]
+
+
+def test_origin_argument_and_ttl_units():
+    recs = parse("a 1h30m IN A 10.0.0.1\n", origin="example.org")
+    assert recs == [{"Name": "a.example.org.", "Type": "A", "TTL": 5400, "Value": "10.0.0.1"}]
+
+
+def test_ttl_inherited_from_previous_record_without_ttl_directive():
+    recs = parse("a 30 A 10.0.0.1\nb A 10.0.0.2\n", origin="example.org.")
+    assert [r["TTL"] for r in recs] == [30, 30]
+
+
+@pytest.mark.parametrize("text,error", [
+    ("$ORIGIN example.com.\na A 10.0.0.1\n", "line 2: No TTL given"),
+    ("$ORIGIN example.com.\n  300 A 10.0.0.1\n", "line 2: Record without owner name"),
+    ('$ORIGIN example.com.\na 300 TXT "open\n', "line 2: Unterminated quoted string"),
+    ("$ORIGIN example.com.\n@ 300 SOA a b ( 1 2\n", "unbalanced '('"),
+    ("a 300 A 10.0.0.1\n", "Relative name 'a' used without $ORIGIN"),
+    ("$INCLUDE other.zone\n", "Unsupported directive"),
+])
+def test_errors(text, error):
+    with pytest.raises(ValueError, match=re.escape(error)):
+        parse(text)
+
+
+def test_format_rrset_round_trip():
+    rr = {"Name": "www.example.com.", "Type": "A", "TTL": 300, "ResourceRecords": [{"Value": "10.0.0.1"}]}
+    assert parse("\n".join(zonefile.format_rrset(rr)) + "\n") == [
+        {"Name": "www.example.com.", "Type": "A", "TTL": 300, "Value": "10.0.0.1"}]
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import functools
+import math
+import os
+import threading
+import time
+
+# Sustained requests/second and burst per (service, API family), kept just under
+# the documented AWS defaults. Route53 limits are per account, so all its
+# clients share one "global" bucket; other services get one bucket per region.
+DEFAULT_LIMITS = {
+    ("ec2", "read"): (20.0, 100),
+    ("ec2", "write"): (5.0, 50),
+    ("route53", "read"): (5.0, 5),
+    ("route53", "write"): (5.0, 5),
+    ("resourcegroupstaggingapi", "read"): (5.0, 10),
+    ("sts", "read"): (20.0, 50),
+    ("s3", "read"): (500.0, 1000),
+    ("s3", "write"): (300.0, 600),
+}
+FALLBACK_LIMIT = (10.0, 20)
+GLOBAL_SERVICES = {"route53"}
+_READ_PREFIXES = ("Describe", "List", "Get", "Head", "Lookup")
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available."""
+
+    def __init__(self, rate: float, burst: int):
+        if not (rate > 0 and math.isfinite(rate)) or burst < 1:
+            raise ValueError("rate must be finite and > 0, and burst >= 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_limits = dict(DEFAULT_LIMITS)
+_enabled = True
+_buckets: dict[tuple, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def parse_limits(spec: str) -> dict:
+    """'ec2:read=20/100,route53=5/5' -> {(service, family): (rate, burst)}; a bare
+    service sets both families, and a missing burst defaults to the rate."""
+    out = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            target, value = part.split("=", 1)
+            rate_s, _, burst_s = value.partition("/")
+            rate = float(rate_s)
+            if not (rate > 0 and math.isfinite(rate)):
+                raise ValueError
+            burst = int(burst_s) if burst_s else max(1, int(rate))
+            if burst < 1:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid rate limit {part!r} (expected service[:read|write]=rate[/burst], rate > 0, burst >= 1)") from None
+        service, _, family = target.strip().partition(":")
+        for fam in ([family] if family else ["read", "write"]):
+            if fam not in ("read", "write"):
+                raise ValueError(f"Unknown API family {fam!r} in {part!r}")
+            out[(service, fam)] = (rate, burst)
+    return out
+
+
+def configure(spec: str | None = None):
+    """Apply a --rate-limits / MAROMTOOL_RATE_LIMITS spec ('off' disables limiting)."""
+    global _enabled
+    spec = spec if spec is not None else os.environ.get("MAROMTOOL_RATE_LIMITS", "")
+    with _buckets_lock:
+        _buckets.clear()
+        _limits.clear()
+        _limits.update(DEFAULT_LIMITS)
+        _enabled = spec.strip().lower() != "off"
+        if _enabled:
+            _limits.update(parse_limits(spec))
+
+
+def family(operation: str) -> str:
+    return "read" if operation.startswith(_READ_PREFIXES) else "write"
+
+
+def bucket_for(service: str, region: str | None, fam: str) -> TokenBucket:
+    key = (service, "global" if service in GLOBAL_SERVICES else region, fam)
+    with _buckets_lock:
+        b = _buckets.get(key)
+        if b is None:
+            b = _buckets[key] = TokenBucket(*_limits.get((service, fam), FALLBACK_LIMIT))
+    return b
+
+
+def _before_send(service: str, region: str | None, event_name: str = "", **kwargs):
+    # Runs once per HTTP attempt, so retries draw from the same shared bucket.
+    if _enabled:
+        bucket_for(service, region, family(event_name.rsplit(".", 1)[-1])).acquire()
+
+
+def install(client):
+    """Make every request of `client` draw from the process-wide buckets."""
+    service = client.meta.service_model.service_name
+    client.meta.events.register("before-send", functools.partial(_before_send, service, client.meta.region_name))
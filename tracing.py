@@ -0,0 +1,128 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_active: "Tracer | None" = None
+_local = threading.local()
+
+
+class Tracer:
+    """Collects complete ("X") events in Chrome trace-event format.
+
+    Every API call becomes a span on the calling thread with one child span per
+    HTTP attempt, so retries and S3 transfer parts show up on their worker threads.
+    Open the file in Perfetto or chrome://tracing.
+    """
+
+    def __init__(self, started: float | None = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.pid = os.getpid()
+        self.events: list[dict] = []
+        self.threads: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, cat: str, start: float, end: float, args: dict | None = None):
+        t = threading.current_thread()
+        ev = {"name": name, "cat": cat, "ph": "X", "pid": self.pid, "tid": t.ident,
+              "ts": round((start - self.started) * 1e6, 1), "dur": round((end - start) * 1e6, 1)}
+        if args:
+            ev["args"] = args
+        with self._lock:
+            self.events.append(ev)
+            self.threads.setdefault(t.ident, t.name)
+
+    @contextmanager
+    def span(self, name: str, cat: str = "phase", **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, cat, start, time.perf_counter(), args or None)
+
+    # botocore event handlers
+    def _start(self, context=None, **kwargs):
+        if context is not None:
+            context["trace_started"] = time.perf_counter()
+            context["trace_attempts"] = 0
+
+    def _before_send(self, **kwargs):
+        _local.attempt_started = time.perf_counter()
+
+    def _response_received(self, context=None, response_dict=None, exception=None, event_name: str = "", **kwargs):
+        started = getattr(_local, "attempt_started", None)
+        if started is None:
+            return
+        _local.attempt_started = None
+        attempt = 1
+        if context is not None:
+            attempt = context["trace_attempts"] = context.get("trace_attempts", 0) + 1
+        args = {"attempt": attempt}
+        if response_dict:
+            args["status"] = response_dict.get("status_code")
+        if exception is not None:
+            args["error"] = repr(exception)
+        self.add(f"attempt {attempt}", "http", started, time.perf_counter(), args)
+
+    def _after_call(self, model=None, context=None, http_response=None, parsed=None, **kwargs):
+        started = (context or {}).get("trace_started")
+        if started is None or model is None:
+            return
+        meta = (parsed or {}).get("ResponseMetadata", {})
+        self.add(f"{model.service_model.service_name}.{model.name}", "api", started, time.perf_counter(),
+                 {"status": getattr(http_response, "status_code", None), "retries": meta.get("RetryAttempts", 0),
+                  "region": (context or {}).get("client_region")})
+
+    def _after_call_error(self, context=None, exception=None, event_name: str = "", **kwargs):
+        started = (context or {}).get("trace_started")
+        if started is not None:
+            self.add(event_name.split(".", 1)[-1], "api", started, time.perf_counter(), {"error": repr(exception)})
+
+    def install(self, client):
+        ev = client.meta.events
+        ev.register_first("before-parameter-build", self._start)
+        ev.register_last("before-send", self._before_send)
+        ev.register("response-received", self._response_received)
+        ev.register_last("after-call", self._after_call)
+        ev.register_last("after-call-error", self._after_call_error)
+
+    def save(self, path: str):
+        with self._lock:
+            meta = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in self.threads.items()]
+            data = {"traceEvents": meta + sorted(self.events, key=lambda e: e["ts"]), "displayTimeUnit": "ms"}
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+
+
+def enable(started: float | None = None) -> Tracer:
+    """Start tracing; timestamps are relative to `started` (default: now)."""
+    global _active
+    _active = Tracer(started)
+    return _active
+
+
+def disable():
+    global _active
+    _active = None
+
+
+def active() -> "Tracer | None":
+    return _active
+
+
+def install(client):
+    if _active is not None:
+        _active.install(client)
+
+
+@contextmanager
+def span(name: str, cat: str = "phase", **args):
+    """Record a span when tracing is enabled; a no-op otherwise."""
+    if _active is None:
+        yield
+    else:
+        with _active.span(name, cat, **args):
+            yield
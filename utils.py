@@ -1,9 +1,42 @@
+import contextlib
 import getpass
+import hashlib
+import os
+import threading
+import weakref
+from botocore.config import Config
+import concurrency
+import stats
+import throttle
+import tracing
 
 CREATED_BY_KEY = "CreatedBy"
 CREATED_BY_VAL = "platform-cli"
 OWNER_KEY = "Owner"
 
+_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_session_settings: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_accounts: dict[str, str] = {}
+_clients_lock = threading.Lock()
+
+# Applied to every client the tool creates (see configure_clients / client_for).
+# The CLI raises max_pool_connections to the command's worker count, so parallel
+# workers sharing a client neither queue for a connection nor discard one and
+# pay for a new TLS handshake; keepalive keeps idle pooled connections usable.
+DEFAULT_POOL_CONNECTIONS = 10
+CLIENT_SETTINGS = {
+    "retry_mode": "adaptive",
+    "max_attempts": 8,
+    "connect_timeout": 5,
+    "read_timeout": 30,
+    "max_pool_connections": DEFAULT_POOL_CONNECTIONS,
+    "tcp_keepalive": True,
+}
+# Called with each new client: throttle.install makes it share the process-wide
+# rate limits, concurrency.install reports retried and slow calls to the AIMD limiter and
+# stats.install / tracing.install instrument it while --stats / --trace are on.
+CLIENT_HOOKS = [throttle.install, concurrency.install, stats.install, tracing.install]
+
 
 def get_common_tags(owner: str | None = None):
     if not owner:
@@ -29,3 +62,118 @@ def tags_list_to_dict(tags: list[dict]) -> dict:
         if k is not None:
             d[k] = v
     return d
+
+
+def cache_dir(*parts: str) -> str:
+    """Per-user cache directory (override with MAROMTOOL_CACHE_DIR), created 0700."""
+    base = os.environ.get("MAROMTOOL_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "maromtool")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def pool_size(workers: int) -> int:
+    """Connections per client for `workers` threads sharing it (never below botocore's 10)."""
+    return max(DEFAULT_POOL_CONNECTIONS, workers)
+
+
+def _known(settings: dict) -> dict:
+    unknown = set(settings) - set(CLIENT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown client settings: {sorted(unknown)}")
+    return {k: v for k, v in settings.items() if v is not None}
+
+
+def configure_clients(**settings):
+    """Update CLIENT_SETTINGS for clients created from now on."""
+    CLIENT_SETTINGS.update(_known(settings))
+
+
+@contextlib.contextmanager
+def restored_client_settings():
+    """Undo configure_clients calls made in the block (the daemon runs every
+    request in its own process, and one request's flags must not stick)."""
+    saved = dict(CLIENT_SETTINGS)
+    try:
+        yield
+    finally:
+        CLIENT_SETTINGS.clear()
+        CLIENT_SETTINGS.update(saved)
+
+
+def configure_session(session, **settings):
+    """Override CLIENT_SETTINGS for the clients `session` creates from now on
+    (a library caller's pool size must not leak into every other session)."""
+    with _clients_lock:
+        _session_settings.setdefault(session, {}).update(_known(settings))
+
+
+def client_settings(session=None) -> dict:
+    """CLIENT_SETTINGS with `session`'s overrides applied."""
+    with _clients_lock:
+        return {**CLIENT_SETTINGS, **_session_settings.get(session, {})} if session is not None else dict(CLIENT_SETTINGS)
+
+
+def client_config(settings: dict | None = None) -> Config:
+    s = settings or CLIENT_SETTINGS
+    return Config(
+        retries={"mode": s["retry_mode"], "total_max_attempts": s["max_attempts"]},
+        connect_timeout=s["connect_timeout"],
+        read_timeout=s["read_timeout"],
+        max_pool_connections=s["max_pool_connections"],
+        tcp_keepalive=s["tcp_keepalive"],
+    )
+
+
+def client_for(session, service: str, region: str | None = None):
+    """Return the session's warm client for (service, region) under the current
+    client settings, creating it once.
+
+    Client creation on a boto3 Session is not thread-safe, so it happens under a
+    lock; the clients themselves are safe to share between worker threads.
+    """
+    with _clients_lock:
+        settings = {**CLIENT_SETTINGS, **_session_settings.get(session, {})}
+        key = (service, region or session.region_name, tuple(sorted(settings.items())))
+        per_session = _clients.setdefault(session, {})
+        client = per_session.get(key)
+        if client is None:
+            config = client_config(settings)
+            with stats.phase("client-setup"):
+                client = session.client(service, region_name=key[1], config=config)
+                for hook in CLIENT_HOOKS:
+                    hook(client)
+            per_session[key] = client
+    return client
+
+
+def account_id(session) -> str:
+    """The account of the session's credentials. sts:GetCallerIdentity is asked
+    once per access key and the answer kept in the cache dir: a key never moves
+    to another account."""
+    creds = session.get_credentials()
+    if creds is None:
+        return client_for(session, "sts").get_caller_identity()["Account"]  # raises NoCredentialsError
+    key = hashlib.sha1(creds.get_frozen_credentials().access_key.encode()).hexdigest()[:20]
+    with _clients_lock:
+        account = _accounts.get(key)
+    if account is not None:
+        return account
+    path = os.path.join(cache_dir("accounts"), key)
+    try:
+        with open(path, encoding="utf-8") as fh:
+            account = fh.read().strip()
+    except OSError:
+        pass
+    if not account:
+        account = client_for(session, "sts").get_caller_identity()["Account"]
+        try:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                fh.write(account)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    with _clients_lock:
+        _accounts[key] = account
+    return account
@@ -0,0 +1,168 @@
+from __future__ import annotations
+import ipaddress
+import marshal
+import os
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import concurrency
+import route53_handler as r53h
+from utils import cache_dir
+
+SNAPSHOT_VERSION = 1
+_LEAF = ""  # labels are never empty, so "" marks the record list of a trie node
+
+
+def default_path(profile: str | None) -> str:
+    return os.path.join(cache_dir(), f"route53-snapshot-{profile or 'default'}.marshal")
+
+
+def _norm_value(value: str) -> str:
+    return value.lower().rstrip(".")
+
+
+def _ip_key(value: str):
+    try:
+        ip = ipaddress.ip_address(value)
+    except ValueError:
+        return None
+    return (ip.version, int(ip))
+
+
+class ZoneSnapshot:
+    """Records of all CLI-managed zones with name, value and IP indexes.
+
+    Records are tuples (zone_index, name, type, ttl, values). The name index is
+    a trie over reversed labels so suffix queries only walk the matching subtree.
+    """
+
+    def __init__(self, taken_at: float, zones: list, records: list, trie: dict, by_value: dict, ip_keys: list, ip_idx: list):
+        self.taken_at = taken_at
+        self.zones = zones
+        self.records = records
+        self.trie = trie
+        self.by_value = by_value
+        self.ip_keys = ip_keys
+        self.ip_idx = ip_idx
+
+    @classmethod
+    def build(cls, zones: list, zone_records: list, taken_at: float | None = None) -> "ZoneSnapshot":
+        records, trie, by_value, ips = [], {}, {}, []
+        for zi, rrsets in enumerate(zone_records):
+            for rr in rrsets:
+                values = tuple(v["Value"] for v in rr.get("ResourceRecords", []))
+                alias = (rr.get("AliasTarget") or {}).get("DNSName")
+                if alias:
+                    values += (alias,)
+                idx = len(records)
+                name = rr["Name"].lower()
+                records.append((zi, name, rr["Type"], rr.get("TTL"), values))
+
+                node = trie
+                for label in r53h.label_key(name):
+                    node = node.setdefault(label, {})
+                node.setdefault(_LEAF, []).append(idx)
+                for v in values:
+                    by_value.setdefault(_norm_value(v), []).append(idx)
+                    key = _ip_key(v)
+                    if key:
+                        ips.append((key, idx))
+        ips.sort()
+        return cls(taken_at or time.time(), zones, records, trie, by_value,
+                   [k for k, _ in ips], [i for _, i in ips])
+
+    def save(self, path: str):
+        data = {"version": SNAPSHOT_VERSION, "taken_at": self.taken_at, "zones": self.zones,
+                "records": self.records, "trie": self.trie, "by_value": self.by_value,
+                "ip_keys": self.ip_keys, "ip_idx": self.ip_idx}
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            marshal.dump(data, fh)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ZoneSnapshot":
+        try:
+            with open(path, "rb") as fh:
+                data = marshal.load(fh)
+        except FileNotFoundError:
+            raise RuntimeError("No zone snapshot found; run 'route53 snapshot' first") from None
+        except (EOFError, ValueError, TypeError):
+            data = None
+        if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+            raise RuntimeError("Zone snapshot is unreadable or from another version; run 'route53 snapshot' again")
+        data.pop("version")
+        return cls(**data)
+
+    def _by_name(self, name: str, suffix: bool) -> list[int]:
+        node = self.trie
+        for label in r53h.label_key(r53h.normalize_name(name)):
+            node = node.get(label)
+            if node is None:
+                return []
+        if not suffix:
+            return list(node.get(_LEAF, []))
+        out, stack = [], [node]
+        while stack:
+            n = stack.pop()
+            for label, child in n.items():
+                if label == _LEAF:
+                    out.extend(child)
+                else:
+                    stack.append(child)
+        return out
+
+    def _by_ip(self, query: str) -> list[int]:
+        net = ipaddress.ip_network(query, strict=False)
+        lo = bisect_left(self.ip_keys, (net.version, int(net.network_address)))
+        hi = bisect_right(self.ip_keys, (net.version, int(net.broadcast_address)))
+        return self.ip_idx[lo:hi]
+
+    def query(self, name: str | None = None, suffix: bool = False, value: str | None = None,
+              ip: str | None = None, rtype: str | None = None) -> list[dict]:
+        if not (name or value or ip):
+            raise ValueError("Give at least one of --name, --value or --ip")
+        candidates = None
+        for hits in ((self._by_name(name, suffix) if name else None),
+                     (self.by_value.get(_norm_value(value), []) if value else None),
+                     (self._by_ip(ip) if ip else None)):
+            if hits is not None:
+                candidates = set(hits) if candidates is None else candidates & set(hits)
+        out = []
+        for idx in sorted(candidates):
+            zi, rname, t, ttl, values = self.records[idx]
+            if rtype and t != rtype:
+                continue
+            zid, zname = self.zones[zi]
+            out.append({"ZoneId": zid, "Zone": zname, "Name": rname, "Type": t, "TTL": ttl, "Values": list(values)})
+        return out
+
+
+def take_snapshot(session: boto3.Session, path: str, max_workers: int = 8):
+    """Fetch every CLI-managed zone concurrently and write the indexed snapshot."""
+    started = time.monotonic()
+    r53 = r53h.r53_client(session)
+    zones = r53h.list_zones(session)
+    limiter = concurrency.AdaptiveLimiter(max_workers)
+
+    def fetch(z):
+        return list(r53h.iter_record_sets(r53, z["Id"]))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        zone_records = list(pool.map(lambda z: limiter.run(fetch, z), zones))
+    snap = ZoneSnapshot.build([(z["Id"], z["Name"]) for z in zones], zone_records)
+    snap.save(path)
+    return {"Path": path, "Zones": len(zones), "Records": len(snap.records),
+            "Seconds": round(time.monotonic() - started, 3), "Concurrency": limiter.report()}
+
+
+def query_snapshot(path: str, **criteria):
+    started = time.monotonic()
+    snap = ZoneSnapshot.load(path)
+    matches = snap.query(**criteria)
+    return {"SnapshotTakenAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(snap.taken_at)),
+            "SnapshotAgeSeconds": int(time.time() - snap.taken_at),
+            "QueryMs": round((time.monotonic() - started) * 1000, 2),
+            "Matches": matches}
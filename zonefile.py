@@ -0,0 +1,168 @@
+from __future__ import annotations
+import re
+
+# Record types whose rdata contains domain names, mapped to the token positions
+# that must be qualified against $ORIGIN when written relative.
+NAME_FIELDS = {"CNAME": (0,), "NS": (0,), "PTR": (0,), "MX": (1,), "SRV": (3,), "SOA": (0, 1)}
+_CLASSES = {"IN", "CH", "HS"}
+_TTL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_TTL_RE = re.compile(r"(?:\d+[smhdw])+", re.IGNORECASE)
+_SEP = " \t\r\n;()\""
+
+
+def is_ttl(tok: str) -> bool:
+    return tok.isdigit() or bool(_TTL_RE.fullmatch(tok))
+
+
+def parse_ttl(tok: str) -> int:
+    if tok.isdigit():
+        return int(tok)
+    if not _TTL_RE.fullmatch(tok):
+        raise ValueError(f"Invalid TTL: {tok}")
+    return sum(int(n) * _TTL_UNITS[u.lower()] for n, u in re.findall(r"(\d+)([a-zA-Z])", tok))
+
+
+def _tokenize(line: str) -> list[str]:
+    toks = []
+    i, n = 0, len(line)
+    while i < n:
+        c = line[i]
+        if c in " \t\r\n":
+            i += 1
+        elif c == ";":
+            break
+        elif c in "()":
+            toks.append(c)
+            i += 1
+        elif c == '"':
+            j = i + 1
+            while j < n and line[j] != '"':
+                j += 2 if line[j] == "\\" else 1
+            if j >= n:
+                raise ValueError("Unterminated quoted string")
+            toks.append(line[i:j + 1])
+            i = j + 1
+        else:
+            j = i
+            while j < n and line[j] not in _SEP:
+                j += 2 if line[j] == "\\" else 1
+            toks.append(line[i:j])
+            i = j
+    return toks
+
+
+def _logical_lines(lines):
+    """Join parenthesised multi-line records; yields (line_no, owner_omitted, tokens)."""
+    buf, depth, start, blank = [], 0, 0, False
+    for no, line in enumerate(lines, 1):
+        try:
+            toks = _tokenize(line)
+        except ValueError as e:
+            raise ValueError(f"line {no}: {e}") from None
+        if not toks:
+            continue
+        if not buf and depth == 0:
+            start, blank = no, line[:1] in (" ", "\t")
+        for t in toks:
+            if t == "(":
+                depth += 1
+            elif t == ")":
+                depth -= 1
+                if depth < 0:
+                    raise ValueError(f"line {no}: unbalanced ')'")
+            else:
+                buf.append(t)
+        if depth == 0 and buf:
+            yield start, blank, buf
+            buf = []
+    if depth:
+        raise ValueError(f"line {start}: unbalanced '('")
+
+
+def absolute_name(name: str, origin: str | None) -> str:
+    if name == "@":
+        if not origin:
+            raise ValueError("'@' used without $ORIGIN")
+        return origin
+    if name.endswith(".") and not name.endswith("\\."):
+        return name
+    if not origin:
+        raise ValueError(f"Relative name {name!r} used without $ORIGIN")
+    return f"{name}.{origin}"
+
+
+def parse_zone(lines, origin: str | None = None, default_ttl: int | None = None):
+    """Incrementally parse RFC 1035 zone-file text.
+
+    Yields one dict per resource record (Name, Type, TTL, Value); nothing beyond
+    the current logical record is kept in memory.
+    """
+    if origin and not origin.endswith("."):
+        origin += "."
+    last_owner, last_ttl = None, None
+    for no, blank, toks in _logical_lines(lines):
+        try:
+            if toks[0].startswith("$"):
+                directive = toks[0].upper()
+                if len(toks) < 2:
+                    raise ValueError(f"{directive} needs an argument")
+                if directive == "$ORIGIN":
+                    origin = absolute_name(toks[1], origin)
+                elif directive == "$TTL":
+                    default_ttl = parse_ttl(toks[1])
+                else:
+                    raise ValueError(f"Unsupported directive {toks[0]}")
+                continue
+
+            if blank:
+                if last_owner is None:
+                    raise ValueError("Record without owner name")
+                name = last_owner
+            else:
+                name = absolute_name(toks.pop(0), origin)
+
+            ttl = None
+            while toks and (toks[0].upper() in _CLASSES or is_ttl(toks[0])):
+                tok = toks.pop(0)
+                if tok.upper() not in _CLASSES:
+                    ttl = parse_ttl(tok)
+            if not toks:
+                raise ValueError("Missing record type")
+            rtype = toks.pop(0).upper()
+            if not toks:
+                raise ValueError(f"Missing rdata for {rtype} record")
+            if ttl is None:
+                ttl = default_ttl if default_ttl is not None else last_ttl
+            if ttl is None:
+                raise ValueError("No TTL given and no $TTL in effect")
+
+            for idx in NAME_FIELDS.get(rtype, ()):
+                if idx < len(toks):
+                    toks[idx] = absolute_name(toks[idx], origin)
+        except ValueError as e:
+            raise ValueError(f"line {no}: {e}") from None
+
+        last_owner, last_ttl = name, ttl
+        yield {"Name": name, "Type": rtype, "TTL": ttl, "Value": " ".join(toks)}
+
+
+def _unescape_char(m: re.Match) -> str:
+    # Route53 escapes with octal \DDD, zone files use decimal \DDD.
+    c = chr(int(m.group(1), 8))
+    return c if c.isalnum() or c in "*-_" else f"\\{ord(c):03d}"
+
+
+def bind_name(r53_name: str) -> str:
+    return re.sub(r"\\([0-7]{3})", _unescape_char, r53_name)
+
+
+def format_rrset(rr: dict) -> list[str]:
+    """Render one Route53 ResourceRecordSet as zone-file lines.
+
+    Alias and routing-policy records have no zone-file form and are emitted as comments.
+    """
+    name = bind_name(rr["Name"])
+    if not rr.get("ResourceRecords") or rr.get("SetIdentifier"):
+        target = (rr.get("AliasTarget") or {}).get("DNSName") or rr.get("SetIdentifier")
+        return [f"; {name} {rr['Type']} not representable (alias/routing policy: {target})"]
+    return [f"{name}\t{rr.get('TTL', '')}\tIN\t{rr['Type']}\t{r['Value']}" for r in rr["ResourceRecords"]]